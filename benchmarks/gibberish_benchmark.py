@@ -0,0 +1,127 @@
+# benchmarks/gibberish_benchmark.py
+#
+# Compares the original GibberishDetector path (a wordfreq lookup for every token of every message)
+# with the preloaded vocabulary + memoized token verdicts, on a corpus of real and junk chat messages.
+# With --ngram-model, the character trigram engine is timed too and its verdicts compared with wordfreq's.
+#
+#   python benchmarks/gibberish_benchmark.py [--messages 20000] [--repeat 3] [--ngram-model gibberish_ngram_model.npz]
+
+import argparse
+import random
+import re
+import string
+import sys
+import time
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from utils.gibberish_detector import GibberishDetector
+
+REAL_MESSAGES = [
+    "How do I apply for annual leave?",
+    "What is the difference between a class and an individual in the ontology?",
+    "Show me the employee diagram for the Singapore ontology",
+    "Can you explain how the department hierarchy is modelled in RDF?",
+    "Tell me a story about Harper and the HR onboarding process",
+    "hmm ok, and what about the Germany version?",
+    "Which properties link an employee to their manager?",
+    "thanks! can you show the unified ontology picture please",
+    "What does OntologyOne use for role assignments?",
+    "Is there a JSON export of the China employee schema?",
+]
+
+JUNK_MESSAGES = [
+    "asdfasdf qwerty",
+    "sdkfjh sdkjfh kjsdhf",
+    "zxcvbnm",
+    "12345678 99999",
+    "lkjhg poiuy mnbvc",
+    "!!!??? ###",
+    "a1b2c3 d4e5f6 xx99yy",
+    "qweqweqwe asdasd",
+]
+
+def random_junk(rng: random.Random) -> str:
+    words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9)))
+             for _ in range(rng.randint(1, 6))]
+    return " ".join(words)
+
+def make_corpus(size: int, junk_share: float, rng: random.Random) -> list[str]:
+    corpus = []
+    for _ in range(size):
+        if rng.random() < junk_share:
+            corpus.append(rng.choice(JUNK_MESSAGES) if rng.random() < 0.5 else random_junk(rng))
+        else:
+            corpus.append(rng.choice(REAL_MESSAGES))
+    return corpus
+
+def baseline_is_gibberish(detector: GibberishDetector, text: str) -> bool:
+    """The original per-message loop: regexes compiled on the fly and wordfreq called for every unknown token."""
+    from wordfreq import word_frequency
+
+    tokens = text.strip().split()
+    if not tokens or re.fullmatch(r'[a-zA-Z]{10,}', text):
+        return True
+
+    gibberish_count = 0
+    for token in tokens:
+        clean_token = token.strip(string.punctuation)
+        if detector._is_whitelisted(clean_token) or detector._is_valid_filler(clean_token):
+            continue
+        if word_frequency(clean_token, lang="en") > 0:
+            continue
+        detector._is_keyboard_smash(clean_token)
+        re.fullmatch(r'\d{5,}', clean_token)
+        detector._has_mixed_chars(clean_token)
+        detector._is_symbols_only(clean_token)
+        gibberish_count += 1
+    return gibberish_count / len(tokens) > detector.threshold
+
+def time_it(fn, corpus, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in corpus:
+            fn(text)
+    return (time.perf_counter() - start) / (repeat * len(corpus)) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--junk-share", type=float, default=0.3)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--ngram-model", type=Path, default=None)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    corpus = make_corpus(args.messages, args.junk_share, rng)
+
+    start = time.perf_counter()
+    detector = GibberishDetector()
+    print(f"detector startup (vocabulary load): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    # both paths must agree on every message
+    mismatches = [text for text in corpus if detector.is_gibberish(text) != baseline_is_gibberish(detector, text)]
+    assert not mismatches, mismatches[:5]
+    flagged = sum(detector.is_gibberish(text) for text in corpus)
+    print(f"{len(corpus)} messages, {flagged} flagged as gibberish")
+
+    uncached = GibberishDetector(cache_size=0)
+    variants = [
+        ("baseline (wordfreq per token)", lambda text: baseline_is_gibberish(detector, text)),
+        ("vocabulary, no verdict cache", uncached.is_gibberish),
+        ("vocabulary + verdict cache", detector.is_gibberish),
+    ]
+    if args.ngram_model:
+        ngram = GibberishDetector(engine="ngram", ngram_model_path=args.ngram_model)
+        variants.append(("ngram engine", ngram.is_gibberish))
+        disagreements = sorted({text for text in corpus if ngram.is_gibberish(text) != detector.is_gibberish(text)})
+        print(f"ngram engine disagrees with wordfreq on {len(disagreements)} distinct messages: {disagreements[:5]}")
+    print(f"{'variant':<32} {'us/message':>12}")
+    for name, fn in variants:
+        print(f"{name:<32} {time_it(fn, corpus, args.repeat):>12.2f}")
+    print(f"verdict cache: {detector.cache_info()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/image_index_benchmark.py
+#
+# Compares the original "score everything, build tuples, sort" image search with ImageIndex
+# (contiguous matrix + argpartition top-k, optional keyword mask) on synthetic catalogs.
+#
+#   python benchmarks/image_index_benchmark.py [--sizes 10000 100000] [--dim 512] [--repeat 20]
+
+import argparse
+import sys
+import time
+
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from utils.image_index import ImageIndex
+
+ONTOLOGIES = ["china", "germany", "singapore", "usa", "unified"]
+FOCUS = ["class", "employee", "department", "role", "individual"]
+
+def make_catalog(size: int, dim: int, rng: np.random.Generator):
+    embeddings = rng.standard_normal((size, dim), dtype=np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    metadata = [
+        {"file_name": f"image_{i}.png",
+         "description": f"{ONTOLOGIES[i % len(ONTOLOGIES)]} ontology: {FOCUS[(i // 5) % len(FOCUS)]} diagram {i}"}
+        for i in range(size)
+    ]
+    return metadata, embeddings
+
+def baseline_search(metadata, embeddings, query, top_k):
+    similarities = embeddings @ query
+    scored_results = [
+        (item["file_name"], float(score), item["description"])
+        for item, score in zip(metadata, similarities)
+    ]
+    return sorted(scored_results, key=lambda x: x[1], reverse=True)[:top_k]
+
+def keyword_fn(description: str) -> list[str]:
+    return [word for word in description.replace(":", " ").split() if word in ONTOLOGIES or word in FOCUS]
+
+def time_it(fn, queries, repeat):
+    fn(queries[0])    # warm up
+    start = time.perf_counter()
+    for i in range(repeat):
+        fn(queries[i % len(queries)])
+    return (time.perf_counter() - start) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'images':>8} {'variant':<28} {'ms/query':>10} {'matrix MB':>10}")
+
+    for size in args.sizes:
+        metadata, embeddings = make_catalog(size, args.dim, rng)
+        queries = [embeddings[rng.integers(size)] for _ in range(8)]
+
+        index32 = ImageIndex(metadata, embeddings, keyword_fn)
+        mask = index32.mask_for([["china"], ["employee"]])
+
+        # the fast paths must agree with the baseline on the top hit
+        expected = baseline_search(metadata, embeddings, queries[0], args.top_k)
+        assert index32.search(queries[0], args.top_k)[0][0] == expected[0][0]
+
+        variants = [
+            ("baseline (tuples + sort)", lambda q: baseline_search(metadata, embeddings, q, args.top_k), embeddings),
+            ("ImageIndex float32", lambda q: index32.search(q, args.top_k), index32.embeddings),
+            ("ImageIndex float32 + mask", lambda q: index32.search(q, args.top_k, mask), index32.embeddings),
+        ]
+        for name, fn, matrix in variants:
+            ms = time_it(fn, queries, args.repeat)
+            print(f"{size:>8} {name:<28} {ms:>10.3f} {matrix.nbytes / 2**20:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# benchmarks/session_store_benchmark.py
+#
+# Conformance checks and per-operation latency for the chat session stores (memory, SQLite, PostgreSQL).
+# Every backend must behave the same for the operations the chatbot uses; then each operation is timed.
+# PostgreSQL is only included with --postgres-url (use a scratch database: the schema is created there).
+# --with-cache also runs every backend behind CachedSessionStore.
+#
+#   python benchmarks/session_store_benchmark.py [--backends memory sqlite] [--postgres-url URL] [--repeat 200]
+#                                                [--with-cache]
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+def make_store(backend: str, args):
+    if backend == "memory":
+        from utils.memory_session_store import InMemorySessionStore
+        return InMemorySessionStore()
+    if backend == "sqlite":
+        from utils.sqlite_session_store import SQLiteSessionStore
+        return SQLiteSessionStore(Path(tempfile.mkdtemp()) / "sessions.db")
+    if backend == "postgres":
+        from utils.postgres_session_store import PostgresSessionStore
+        return PostgresSessionStore(db_url=args.postgres_url, schema=args.postgres_schema)
+    raise ValueError(f"unknown backend {backend}")
+
+def check(condition: bool, message: str):
+    if not condition:
+        raise AssertionError(message)
+
+def run_conformance(store):
+    session_id = f"conformance-{uuid.uuid4()}"
+    check(store.fetch_session(session_id) == {"session_id": session_id, "history": []}, "unknown session has no history")
+    check(store.fetch_recent_turns(session_id, 2) == [], "unknown session has no turns")
+
+    store.store_turn(session_id, "u1", "b1")
+    store.store_message(session_id, "user", "feedback", is_feedback=True)
+    store.store_turns([(session_id, "u2", "b2", False), (session_id, "u3", "b3", False)])
+
+    history = store.fetch_session(session_id)["history"]
+    check(len(history) == 7, f"fetch_session returns every message, got {len(history)}")
+    check(history[0] == {"user_message": "u1", "bot_response": ""}, "history entries carry one side each")
+    check(history[1] == {"user_message": "", "bot_response": "b1"}, "history is in insertion order")
+
+    turns = store.fetch_recent_turns(session_id, 2)
+    check(turns == [{"user_message": "u2", "bot_response": "b2"}, {"user_message": "u3", "bot_response": "b3"}],
+          f"fetch_recent_turns returns the last pairs oldest first without feedback, got {turns}")
+    check(len(store.fetch_recent_turns(session_id, 10)) == 3, "fetch_recent_turns is bounded by the history")
+    check(store.fetch_recent_turns(session_id, 0) == [], "zero turns requested returns nothing")
+    check(isinstance(store.pool_stats(), dict), "pool_stats returns a dict")
+
+def time_op(fn, repeat: int) -> tuple[float, float]:
+    samples = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+def run_benchmark(store, repeat: int, history_turns: int):
+    session_id = f"bench-{uuid.uuid4()}"
+    store.store_turns([(session_id, f"user message {i}", f"bot response {i}", False) for i in range(history_turns)])
+    sessions = [f"bench-{uuid.uuid4()}" for _ in range(repeat)]
+
+    return [
+        ("store_turn", time_op(lambda i: store.store_turn(session_id, "user message", "bot response"), repeat)),
+        ("store_turns (batch of 20)", time_op(
+            lambda i: store.store_turns([(sessions[i], "u", "b", False)] * 20), repeat)),
+        ("fetch_recent_turns(2)", time_op(lambda i: store.fetch_recent_turns(session_id, 2), repeat)),
+        (f"fetch_session ({history_turns}+ turns)", time_op(lambda i: store.fetch_session(session_id), repeat)),
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backends", nargs="+", default=["memory", "sqlite"])
+    parser.add_argument("--postgres-url")
+    parser.add_argument("--postgres-schema", default="session_store_benchmark")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--history-turns", type=int, default=50)
+    parser.add_argument("--with-cache", action="store_true")
+    args = parser.parse_args()
+
+    backends = list(args.backends)
+    if args.postgres_url and "postgres" not in backends:
+        backends.append("postgres")
+
+    print(f"{'backend':<16} {'operation':<30} {'p50 ms':>10} {'p95 ms':>10}")
+    for backend in backends:
+        variants = [(backend, make_store(backend, args))]
+        if args.with_cache:
+            from utils.cached_session_store import CachedSessionStore
+            variants.append((f"{backend}+cache", CachedSessionStore(make_store(backend, args))))
+
+        for label, store in variants:
+            store.create_tables()
+            run_conformance(store)
+            for name, (p50, p95) in run_benchmark(store, args.repeat, args.history_turns):
+                print(f"{label:<16} {name:<30} {p50:>10.3f} {p95:>10.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,10 @@
+import asyncio
 import httpx
 import json
 import os
-import re
 import uuid
 
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
@@ -12,14 +12,20 @@ from pathlib import Path
 from pydantic import BaseModel
 
 from utils.ai_client import AIClient
-from utils.chat_session_db import Database
+from utils.chat_session_db import AsyncDatabase, create_session_store
 from utils.chatbot_config import ChatbotConfig
 from utils.chatbot_prompt_builder import ChatbotPromptBuilder
 from utils.config import Config
 from utils.embedding_service import EmbeddingService
 from utils.gibberish_detector import GibberishDetector
-from utils.github_store_client import fetch_cached_doc_path, fetch_cached_story_file_path, fetch_image_url, extract_pages_from_doc
+from utils.github_store_client import (close_http_clients, shutdown_page_extractor, delete_cached_file, describe_cached_files, extract_pages_from_doc,
+                                       fetch_cached_doc_paths, fetch_cached_story_file_paths, fetch_image_url, get_cache_stats,
+                                       is_corpus_sync_enabled, refresh_image_urls, revalidate_cached_files,
+                                       run_cache_revalidation_loop, run_corpus_sync_loop, run_image_url_refresh_loop,
+                                       sync_corpus)
 from utils.logging import get_logger
+from utils.query_analysis import QueryAnalysis, QueryAnalyzer
+from utils.settings import SettingsStore
 
 # ---------- Pydantic Models ----------
 class ChatMessage(BaseModel):
@@ -57,28 +63,47 @@ if Path("build").exists():
 MAX_HISTORY_PAIRS = 2
 
 config = Config()
-debug = config.get("hr-demo", "debug").lower() == "true"
+# typed snapshot of the per-request settings; swapped whole on /reload_config/ or when the files change
+settings_store = SettingsStore()
 app_name = config.get('hr-demo', 'name')
 bot_name = config.get('chatbot', 'name')
 image_search_config_path = config.get("embedding", "image_search_config_path")
 
-min_relevant_score = float(config.get("hr-demo", "min_relevant_score"))
-ai_model = config.get('ai', 'model')
 doc_store_project = config.get("documentstore", "project")
 doc_store_default_folder = config.get("documentstore", "default_folder")
 doc_store_stories_folder = config.get("documentstore", "stories_folder")
-max_history_pairs = int(config.get("chatbot", "max_history_pairs"))
 
 app_logger = get_logger(config.get("log", "app"))
 feedback_logger = get_logger(config.get("log", "chatbot_feedback"))
 
-database = Database()
-database.create_tables()
+# routes use the async facade; the sync store is kept for callers that already run off the event loop
+sync_database = create_session_store()
+sync_database.create_tables()
+database = AsyncDatabase(sync_database)
 
 embedding_service = EmbeddingService()
-gibberish_detector = GibberishDetector()
+# the loader runs inside _get_image_context's worker thread; it reads through the async facade so turns
+# still queued in write-behind are part of the rebuilt context
+embedding_service.set_image_context_history_loader(
+    lambda session_id: [turn["user_message"] for turn in database.fetch_recent_turns_blocking(session_id, 10) if turn["user_message"]]
+)
+gibberish_detector = GibberishDetector(
+    cache_size=config.getint("gibberish", "cache_size", fallback=8192),
+    engine=config.get("gibberish", "engine", fallback="wordfreq"),
+    ngram_model_path=config.get("gibberish", "ngram_model_path", fallback=None),
+)
 
 prompt_builder = ChatbotPromptBuilder()
+
+def _rebuild_prompts(settings):
+    # settings listener: recompile profiles and intent keywords on every reload (route or file watcher),
+    # and watch the files this build read so editing them on disk reloads too
+    prompt_builder.rebuild()
+    settings_store.watch(*prompt_builder.source_paths)
+
+settings_store.subscribe(_rebuild_prompts)
+settings_store.watch(*prompt_builder.source_paths)
+query_analyzer = QueryAnalyzer(prompt_builder, embedding_service.get_keyword_normalizer())
 chat_mode = prompt_builder.get_mode()
 
 chatbot_config = ChatbotConfig()
@@ -88,7 +113,7 @@ ai_client = AIClient()
 
 def load_metadata(json_file_path):
     full_path = os.path.abspath(json_file_path)
-    if debug:
+    if settings_store.current.app.debug:
         print("Resolved full path to image metadata:", full_path)
 
     if not os.path.isfile(json_file_path):
@@ -100,18 +125,24 @@ def load_metadata(json_file_path):
     except json.JSONDecodeError as e:
         raise ValueError(f"Error decoding JSON from {json_file_path}: {e}")
 
-def _process_matches(text_matches, top_n_text_hits, extract_pages_from_doc)-> list[str]:
+async def _process_matches(text_matches, top_n_text_hits, extract_pages_from_doc)-> list[str]:
+    settings = settings_store.current
     text_contents = []
 
+    matches = []
     for match in text_matches[:top_n_text_hits]:
         file_name = match['metadata'].get("file_name")
-        pages = match['metadata'].get("pages")
-
         if not file_name:
             app_logger.error(f"Skipping file_name: {file_name}: missing file_name")
             continue
+        matches.append(match)
+
+    # download all matched docs concurrently before extracting their text
+    cached_doc_paths = await fetch_cached_doc_paths(doc_store_project, [match['metadata']["file_name"] for match in matches])
 
-        cached_doc_path = fetch_cached_doc_path(doc_store_project, file_name)
+    for match, cached_doc_path in zip(matches, cached_doc_paths):
+        file_name = match['metadata'].get("file_name")
+        pages = match['metadata'].get("pages")
 
         if pages:
             # Deduplicate pages while preserving original order
@@ -123,15 +154,16 @@ def _process_matches(text_matches, top_n_text_hits, extract_pages_from_doc)-> li
                     seen_pages.add(page_num)
                     page_list.append(page_num - 1)  # convert to 0-based indexing
 
-            if debug:
+            if settings.app.debug:
                 print(f"file_name: {file_name}, unique pages: {page_list}")
-            text_chunk = extract_pages_from_doc(cached_doc_path, page_list)
+            text_chunk = await asyncio.to_thread(extract_pages_from_doc, cached_doc_path, page_list)
         else:
-            if debug:
+            if settings.app.debug:
                 print(f"file_name: {file_name}, no pages specified, extracting entire file")
 
             file_name = Path(file_name).stem.capitalize().replace('_', ' ')
-            text_chunk = extract_pages_from_doc(cached_doc_path, None)
+            text_chunk = await asyncio.to_thread(extract_pages_from_doc, cached_doc_path, None,
+                                                 settings.documentstore.doc_max_chars)
             text_chunk = f"## {file_name}\n{text_chunk}"
 
         text_contents.append(text_chunk)
@@ -149,18 +181,10 @@ def _generate_AI_response(chatbot_profile:str, user_prompt:str) -> str:
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AI generation failed: {str(e)}")
 
-def _get_chat_history_context(session_id:str) -> str:
-    # Prep chat history to be included in user prompt for chat coherence
-    all_history = database.fetch_session(session_id)["history"]
-
-    # Only include non-feedback messages
-    filtered_history = [
-        ChatMessage(**msg)
-        for msg in all_history
-        if not msg.get("is_feedback")  # assumes feedback flag exists
-    ]
-
-    recent_history = filtered_history[-max_history_pairs:]
+def _get_chat_history_context(recent_turns:list[dict], max_history_pairs:int) -> str:
+    # Prep chat history to be included in user prompt for chat coherence;
+    # recent_turns holds the latest non-feedback user/bot pairs, oldest first
+    recent_history = [ChatMessage(**turn) for turn in recent_turns[-max_history_pairs:]] if max_history_pairs else []
     if not recent_history:
         return ""
 
@@ -175,28 +199,22 @@ def get_shortened_image_description(description:str) -> str:
     """ Drop text after ' in' to shorten image description for display in bot's response """
     return description.split(" in ")[0] if " in " in description else description
 
-def _update_session_and_store_chat_history(session_id:str, user_message:str, bot_response:str, is_feedback:bool=False):
-    # 5. Retrieve session & append new message
-    session_data = database.fetch_session(session_id)
-    session = ChatSession(**session_data)
-    session.history.append(ChatMessage(user_message=user_message, bot_response=bot_response))
-
-    # 6. Store chat history
-    database.store_message(session_id, "user", user_message, is_feedback)
-    database.store_message(session_id, "bot", bot_response, is_feedback)
+async def _update_session_and_store_chat_history(session_id:str, user_message:str, bot_response:str, is_feedback:bool=False):
+    # Store the user message and bot response in one transaction
+    await database.store_turn(session_id, user_message, bot_response, is_feedback)
 
-def _get_story_context(story_matches:list[dict]) -> str:
+async def _get_story_context(story_matches:list[dict]) -> str:
     story_context = None
     if not story_matches:
         return story_context
     
-    story_context = ""
-    for match in story_matches:
-        file_name = match['metadata'].get("file_name")
-        cached_file_path = fetch_cached_story_file_path(doc_store_project, file_name)
+    file_names = [match['metadata'].get("file_name") for match in story_matches]
+    cached_file_paths = await fetch_cached_story_file_paths(doc_store_project, file_names)
 
+    story_context = ""
+    for file_name, cached_file_path in zip(file_names, cached_file_paths):
         story_name = Path(file_name).stem.capitalize().replace('_', ' ')
-        text_chunk = extract_pages_from_doc(cached_file_path)
+        text_chunk = await asyncio.to_thread(extract_pages_from_doc, cached_file_path)
         
         # no longer required since the app_name and bot_name are hardcoded
         # to enable the search for text embedding to work better in pinecone.
@@ -209,28 +227,28 @@ def _get_story_context(story_matches:list[dict]) -> str:
 
     return story_context
 
-def _get_doc_context(session_id: str, user_message:str, tags:list[str]):
+async def _get_doc_context(session_id: str, analysis: QueryAnalysis):
     doc_context = None
 
     # 1. Search Pinecone for text matches
     namespace = embedding_service.get_doc_namespace()
-    doc_matches = embedding_service.search_text_embeddings(namespace, user_message, tags)
+    doc_matches = embedding_service.search_text_embeddings(namespace, analysis.text, list(analysis.tags), analysis.embedding)
 
     if not doc_matches:
         return doc_context
         
     # 3. Fetch relevant content from GitHub OntologyOne folder
     top_n_doc_hits = 2      # use only the top 2 quality hits in order not to bloat the prompt
-    doc_contents = _process_matches(doc_matches, top_n_doc_hits, extract_pages_from_doc)
+    doc_contents = await _process_matches(doc_matches, top_n_doc_hits, extract_pages_from_doc)
     doc_contents = "\n\n".join(doc_contents)
     
     return doc_contents
 
-def _get_image_context(session_id: str, user_message:str):
+def _get_image_context(session_id: str, analysis: QueryAnalysis):
     image_context = None
 
     # 1. Pseudo-search for image matches, currently compare user message vs image metadata file
-    image_matches = embedding_service.search_image_embeddings(user_message)
+    image_matches = embedding_service.search_image_embeddings(session_id, analysis.text, analysis)
     if not image_matches:
         return image_context
     
@@ -246,53 +264,53 @@ def _get_image_context(session_id: str, user_message:str):
             
     return image_context
 
-def enrich_query(session_id: str, user_message: str) -> tuple[str, list[str]]:
-    ONTOLOGY_KEYWORDS = {"china", "germany", "ontologyone", "singapore", "usa", "unified"}
-    FOCUS_KEYWORDS = {"class", "cpf", "department", "employee", "entities", "entity", "individual", "instance", "object", "role", "position"}
-
-    def extract_keywords(text: str, keyword_set: set) -> set:
-        return {word for word in re.findall(r"\w+", text.lower()) if word in keyword_set}
-
-    # Step 1: Extract from current message
-    current_ontology = extract_keywords(user_message, ONTOLOGY_KEYWORDS)
-    current_focus = extract_keywords(user_message, FOCUS_KEYWORDS)
-
-    # Step 2: Get most recent *non-feedback* user message from chat history
-    all_history = database.fetch_session(session_id)["history"]
-    last_user_message = None
-    for msg in reversed(all_history):
-        if msg.get("is_feedback"):
-            continue
-        if msg.get("user_message"):
-            last_user_message = msg["user_message"]
-            break
+def _get_last_user_message(recent_turns: list[dict]):
+    # most recent *non-feedback* user message (feedback is filtered in SQL)
+    for turn in reversed(recent_turns):
+        if turn.get("user_message"):
+            return turn["user_message"]
+    return None
+
+# ---------- Lifecycle ----------
+background_tasks = []
+
+@app.on_event("startup")
+async def startup():
+    # keep the document cache fresh off the request path: either mirror the whole corpus
+    # on a schedule, or revalidate lazily downloaded files with conditional requests
+    if is_corpus_sync_enabled():
+        background_tasks.append(asyncio.create_task(run_corpus_sync_loop()))
+    else:
+        background_tasks.append(asyncio.create_task(run_cache_revalidation_loop()))
 
-    # Step 3: Extract from previous message
-    previous_ontology = extract_keywords(last_user_message, ONTOLOGY_KEYWORDS) if last_user_message else set()
-    previous_focus = extract_keywords(last_user_message, FOCUS_KEYWORDS) if last_user_message else set()
+    # resolve commit-pinned image URLs for the whole images folder in the background
+    background_tasks.append(asyncio.create_task(run_image_url_refresh_loop()))
 
-    # Step 4: Determine what to use for tags
-    tags = []
+    # flush write-behind chat turns in batches (no-op unless [db] write_behind is on)
+    database.start()
 
-    if current_ontology or current_focus:
-        tags.extend(sorted(current_ontology))
-        tags.extend(sorted(current_focus))
-    else:
-        tags.extend(sorted(previous_ontology))
-        tags.extend(sorted(previous_focus))
+    # create message partitions ahead of time, archive idle sessions and drop old partitions
+    background_tasks.append(asyncio.create_task(database.run_lifecycle_loop()))
 
-    # Step 5: Enrich the query with any missing (but found previously) keywords
-    missing_ontology = previous_ontology - current_ontology
-    missing_focus = previous_focus - current_focus
+    # reload the settings snapshot when config.ini or the chatbot config JSON changes on disk (0 = off)
+    settings_watch_interval = config.getfloat("hr-demo", "settings_watch_interval", fallback=0.0)
+    if settings_watch_interval > 0:
+        background_tasks.append(asyncio.create_task(settings_store.run_watch_loop(settings_watch_interval)))
 
-    enriched_parts = [user_message]
-    if missing_ontology:
-        enriched_parts.append(" ".join(missing_ontology))
-    if missing_focus:
-        enriched_parts.append(" ".join(missing_focus))
+@app.on_event("shutdown")
+async def shutdown():
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await database.close()
+    await close_http_clients()
+    shutdown_page_extractor()
 
-    enriched_query = " ".join(enriched_parts)
-    return enriched_query, tags
+def _require_admin(x_admin_token: str = Header(None)):
+    # admin routes are disabled unless ADMIN_TOKEN is set
+    admin_token = os.environ.get("ADMIN_TOKEN")
+    if not admin_token or x_admin_token != admin_token:
+        raise HTTPException(status_code=403, detail="Forbidden")
 
 # ---------- Routes ----------
 @app.get("/")
@@ -301,8 +319,8 @@ def read_root():
 
 @app.post("/chat/start")
 async def start_chat():
+    # the session row is created by its first stored message, so visitors who never chat leave no rows
     session_id = str(uuid.uuid4())
-    database.create_session(session_id)
 
     return {"session_id": session_id}
 
@@ -310,59 +328,76 @@ async def start_chat():
 async def chat_with_bot(session_id: str, request: ChatRequest):
     # await asyncio.sleep(15)   # for debugging bot thinking and typing animation
     
+    # one settings snapshot per request, so a reload mid-request cannot mix old and new values
+    settings = settings_store.current
+
     try:
         user_message = request.user_message
 
+        # tokenize, keyword-match and correct the message once; every stage below reads this analysis
+        analysis = query_analyzer.analyze(user_message)
+
         # check if user message is giiberish, if so, return early
-        if gibberish_detector.is_gibberish(user_message):
+        if gibberish_detector.is_gibberish(user_message, analysis.words):
             bot_response = chatbot_config.get("chatbot_interactions","gibberish_found_response")
            
-            _update_session_and_store_chat_history(session_id, user_message, bot_response)
+            await _update_session_and_store_chat_history(session_id, user_message, bot_response)
             return {
                 "session_id": session_id,
                 "user_message": user_message,
                 "bot_response": bot_response,
-                "history": database.fetch_session(session_id)["history"],
+                "history": (await database.fetch_session(session_id))["history"],
             }
 
         # now that we have established the user message is not gibberish, 
         # categorize its mode and build the chatbot profile for inclusion in the prompt.
-        enriched_user_message, tags = enrich_query(session_id, user_message)
-        if debug:
-            print(f"chatbot enriched_user_message: {enriched_user_message}, tags: {tags}")
+        # one windowed history read per turn, shared by query enrichment and the prompt's history context
+        recent_turns = await database.fetch_recent_turns(session_id, max(settings.chatbot.max_history_pairs, 1))
+
+        analysis = query_analyzer.with_history(analysis, _get_last_user_message(recent_turns))
+        if settings.app.debug:
+            print(f"chatbot enriched_user_message: {analysis.enriched_text}, tags: {analysis.tags}")
         
-        chat_mode = prompt_builder.infer_mode_from_input(enriched_user_message)
+        # the user message is embedded once; the vector serves intent classification and the story/doc searches
+        analysis = query_analyzer.with_embedding(analysis, embedding_service.generate_text_embedding(user_message))
+
+        # keywords are the fast override; without any, the intent classifier decides instead of defaulting to persona
+        chat_mode = query_analyzer.infer_mode(analysis)
+        if settings.chatbot.intent_classifier and chat_mode == prompt_builder.MODE_PERSONA:
+            chat_mode = embedding_service.classify_intent(analysis.embedding, default=chat_mode)
         chatbot_profile = prompt_builder.get_profile(chat_mode)
 
         # get stories context regardless of mode
         story_context = None
         namespace = embedding_service.get_stories_namespace()
-        story_matches = embedding_service.search_text_embeddings(namespace, user_message)
+        story_matches = embedding_service.search_text_embeddings(namespace, user_message, query_vector=analysis.embedding)
             
         # get chat history context regardless of mode
-        chat_history_context = _get_chat_history_context(session_id)
+        chat_history_context = _get_chat_history_context(recent_turns, settings.chatbot.max_history_pairs)
 
         # get doc and image context for app mode only; technical/persona mode => None
         doc_context, image_context = None, None
         if prompt_builder.is_request_for_app_info(chat_mode):
-            doc_context = _get_doc_context(session_id, user_message, tags)
-
-            # if app mode, we will use all the matched stories
-            if story_matches:
-                story_context = _get_story_context(story_matches)
+            # if app mode, we will use all the matched stories;
+            # docs and stories are downloaded concurrently
+            doc_context, story_context = await asyncio.gather(
+                _get_doc_context(session_id, analysis),
+                _get_story_context(story_matches),
+            )
 
-            image_context = _get_image_context(session_id, user_message)
+            # image search may load session history from the database; keep it off the event loop
+            image_context = await asyncio.to_thread(_get_image_context, session_id, analysis)
 
         elif prompt_builder.is_request_for_tech_info(chat_mode):
             # if technical mode, we will use only the first matched stories since
             # it is unlikely that the stories will be required but just in case
             if story_matches:
-                story_context = _get_story_context([story_matches[0]])
+                story_context = await _get_story_context([story_matches[0]])
         
         elif prompt_builder.is_request_for_chatbot_convo(chat_mode):
             # if persona mode, we will use all the matched stories
             if story_matches:
-                story_context = _get_story_context(story_matches)
+                story_context = await _get_story_context(story_matches)
         
         # now that we have assembled all the required context, call the LLM
         user_prompt = prompt_builder.get_user_prompt(user_message, doc_context, story_context, image_context, chat_history_context)
@@ -375,12 +410,12 @@ async def chat_with_bot(session_id: str, request: ChatRequest):
             pass
     
     # 5. Update chat history
-    _update_session_and_store_chat_history(session_id, user_message, bot_response)
+    await _update_session_and_store_chat_history(session_id, user_message, bot_response)
     return {
         "session_id": session_id,
         "user_message": user_message,
         "bot_response": bot_response,
-        "history": database.fetch_session(session_id)["history"],
+        "history": (await database.fetch_session(session_id))["history"],
     }
 class FeedbackPayload(BaseModel):
     session_id: str
@@ -396,11 +431,47 @@ async def submit_feedback(payload: FeedbackPayload):
 
 @app.get("/chat_history/{session_id}")
 async def fetch_chat_history(session_id: str):
-    return ChatSession(**database.fetch_session(session_id))
+    return ChatSession(**(await database.fetch_session(session_id)))
+
+@app.get("/admin/db/pool", dependencies=[Depends(_require_admin)])
+async def get_db_pool_stats():
+    return database.pool_stats()
+
+@app.post("/admin/db/lifecycle", dependencies=[Depends(_require_admin)])
+async def run_db_lifecycle():
+    return await database.run_lifecycle()
+
+@app.get("/admin/cache", dependencies=[Depends(_require_admin)])
+async def get_doc_cache(folder: str = None):
+    return {"stats": get_cache_stats(), "files": describe_cached_files(doc_store_project, folder)}
+
+@app.delete("/admin/cache/{file_name}", dependencies=[Depends(_require_admin)])
+async def delete_doc_cache_file(file_name: str, folder: str = None):
+    if not delete_cached_file(doc_store_project, file_name, folder):
+        raise HTTPException(status_code=404, detail=f"{file_name} is not cached")
+    return {"message": f"{file_name} removed from cache."}
+
+@app.post("/admin/cache/revalidate", dependencies=[Depends(_require_admin)])
+async def revalidate_doc_cache(force: bool = False):
+    return {"results": await revalidate_cached_files(force), "stats": get_cache_stats()}
+
+@app.post("/admin/cache/sync", dependencies=[Depends(_require_admin)])
+async def sync_doc_cache():
+    return {"results": await sync_corpus(), "stats": get_cache_stats()}
+
+@app.post("/admin/images/refresh", dependencies=[Depends(_require_admin)])
+async def refresh_image_pins():
+    return {"results": await refresh_image_urls()}
 
 @app.post("/reload_config/")
 async def reload_chatbot_config():
-    chatbot_config.reload()
-    global ai_client
-    ai_client = AIClient(persona=chatbot_config.get("persona"))
-    return {"message": "Chatbot configuration reloaded successfully."}
\ No newline at end of file
+    # components read the new snapshot on their next request; nothing is recreated
+    try:
+        # the prompt builder is rebuilt by its settings listener; its failure is raised here too
+        settings = await asyncio.to_thread(chatbot_config.reload, True)
+    except Exception as e:
+        # a failed settings parse keeps the previous snapshot, a failed prompt build the previous build
+        raise HTTPException(status_code=500, detail=f"Configuration reload failed: {e}")
+    profile_hashes = prompt_builder.get_profile_hashes()
+    return {"message": "Chatbot configuration reloaded successfully.", "settings_version": settings.version,
+            "profile_hashes": profile_hashes}
\ No newline at end of file
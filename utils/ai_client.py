@@ -8,6 +8,7 @@ from googleapiclient.discovery import build
 
 from utils.config import Config
 from utils.logging import get_logger
+from utils.settings import SettingsStore
 
 class AIClient:
     GEMINI_API_KEY = 'AI_API_KEY'
@@ -17,7 +18,7 @@ class AIClient:
         self.debug = self.config.get("hr-demo", "debug").lower() == "true"
         self.app_logger = get_logger(self.config.get("log", "app"))
 
-        self.model_name = self.config.get('ai', 'model')
+        self.settings_store = SettingsStore()
 
         gemini_api_key = os.environ.get(AIClient.GEMINI_API_KEY)
         if gemini_api_key:
@@ -33,7 +34,8 @@ class AIClient:
             print(f"\n\n ==========> {self.__class__.__name__} prompt:\n{prompt}")
 
         try:
-            model = self._genai.GenerativeModel(self.model_name)
+            # the model name comes from the current settings snapshot, so a reload switches models without a restart
+            model = self._genai.GenerativeModel(self.settings_store.current.ai.model)
             response = model.generate_content(prompt)
 
             return response.text
@@ -0,0 +1,200 @@
+# utils/cached_session_store.py
+
+import threading
+import time
+
+from collections import OrderedDict
+
+from utils.session_store import SessionStore
+
+class CachedSessionStore(SessionStore):
+    """
+    Bounded LRU/TTL cache of session history in front of another SessionStore.
+    Reads populate the cache (the full history from fetch_session, the last turns from
+    fetch_recent_turns) and writes go to the store first, then are appended to the cached entry, so an
+    active conversation is served from memory and the store is only written to.
+    With several worker processes a session's writes may land in another process:
+    - "sticky": trust the cache; use with session-affine routing (or a single worker). TTL bounds staleness.
+    - "validate": before serving a hit, compare the session's newest message_id in the store (one
+      indexed lookup) with the cached one and reload on a mismatch.
+    """
+
+    MODES = ("sticky", "validate")
+
+    def __init__(self, store: SessionStore, max_sessions: int = 1000, ttl_seconds: float = 1800, mode: str = "sticky"):
+        if mode not in self.MODES:
+            raise ValueError(f"{self.__class__.__name__} mode must be one of {self.MODES}, got {mode}")
+        self.store = store
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.mode = mode
+
+        self._entries = OrderedDict()       # session_id -> entry dict, least recently used first
+        self._writes = OrderedDict()        # session_id -> write count, to discard loads that raced a write
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0, "expirations": 0, "write_throughs": 0}
+
+    # --- entries ---
+    def _get_entry(self, session_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            if entry["expires_at"] <= now:
+                del self._entries[session_id]
+                self._stats["expirations"] += 1
+                return None
+            self._entries.move_to_end(session_id)
+            return entry
+
+    def _new_entry(self) -> dict:
+        return {"expires_at": time.monotonic() + self.ttl_seconds, "history": None, "turns": None,
+                "turns_window": 0, "last_message_id": None}
+
+    def _write_count(self, session_id) -> int:
+        with self._lock:
+            return self._writes.get(session_id, 0)
+
+    def _put(self, session_id, write_count, last_message_id, **values):
+        """Cache loaded values unless the session was written to while they were being loaded."""
+        with self._lock:
+            if self._writes.get(session_id, 0) != write_count:
+                return
+            entry = self._entries.get(session_id)
+            if entry is None or entry["last_message_id"] != last_message_id:
+                entry = self._entries[session_id] = self._new_entry()
+            entry.update(values, last_message_id=last_message_id, expires_at=time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _is_current(self, session_id, entry) -> bool:
+        if self.mode != "validate":
+            return True
+        if self.store.fetch_last_message_id(session_id) == entry["last_message_id"]:
+            return True
+        with self._lock:
+            self._stats["stale"] += 1
+            if self._entries.get(session_id) is entry:
+                del self._entries[session_id]
+        return False
+
+    def _record(self, hit: bool):
+        with self._lock:
+            self._stats["hits" if hit else "misses"] += 1
+
+    def invalidate(self, session_id):
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    # --- reads ---
+    def fetch_session(self, session_id):
+        entry = self._get_entry(session_id)
+        if entry and entry["history"] is not None and self._is_current(session_id, entry):
+            self._record(True)
+            return {"session_id": session_id, "history": [dict(msg) for msg in entry["history"]]}
+
+        self._record(False)
+        write_count = self._write_count(session_id)
+        # read the change marker before the data: a write in between leaves the entry looking stale, not fresh
+        last_message_id = self.store.fetch_last_message_id(session_id) if self.mode == "validate" else None
+        session = self.store.fetch_session(session_id)
+        self._put(session_id, write_count, last_message_id, history=[dict(msg) for msg in session["history"]])
+        return session
+
+    def fetch_recent_turns(self, session_id, max_turns):
+        if max_turns <= 0:
+            return []
+
+        entry = self._get_entry(session_id)
+        if entry and entry["turns"] is not None and max_turns <= entry["turns_window"] \
+                and self._is_current(session_id, entry):
+            self._record(True)
+            return [dict(turn) for turn in entry["turns"][-max_turns:]]
+
+        self._record(False)
+        write_count = self._write_count(session_id)
+        last_message_id = self.store.fetch_last_message_id(session_id) if self.mode == "validate" else None
+        turns = self.store.fetch_recent_turns(session_id, max_turns)
+        self._put(session_id, write_count, last_message_id, turns=[dict(turn) for turn in turns], turns_window=max_turns)
+        return turns
+
+    def fetch_last_message_id(self, session_id):
+        return self.store.fetch_last_message_id(session_id)
+
+    # --- writes ---
+    def _append(self, session_id, messages, last_message_id):
+        """Write-through of (sender, message, is_feedback) messages already committed to the store."""
+        with self._lock:
+            self._writes[session_id] = self._writes.get(session_id, 0) + 1
+            self._writes.move_to_end(session_id)
+            while len(self._writes) > 2 * self.max_sessions:
+                self._writes.popitem(last=False)
+
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return
+            for sender, message, is_feedback in messages:
+                if entry["history"] is not None:
+                    entry["history"].append(self.history_entry(sender, message))
+                if entry["turns"] is not None and not is_feedback:
+                    turns = entry["turns"]
+                    if sender == "user" or not turns or turns[-1]["bot_response"]:
+                        turns.append({"user_message": "", "bot_response": ""})
+                    turns[-1]["user_message" if sender == "user" else "bot_response"] = message
+                    del turns[:-entry["turns_window"]]
+            entry["last_message_id"] = last_message_id
+            entry["expires_at"] = time.monotonic() + self.ttl_seconds
+            self._entries.move_to_end(session_id)
+            self._stats["write_throughs"] += 1
+
+    def store_message(self, session_id, sender, message, is_feedback=False):
+        message_id = self.store.store_message(session_id, sender, message, is_feedback)
+        self._append(session_id, [(sender, message, is_feedback)], message_id)
+        return message_id
+
+    def store_turn(self, session_id, user_message, bot_response, is_feedback=False):
+        message_id = self.store.store_turn(session_id, user_message, bot_response, is_feedback)
+        self._append(session_id, [("user", user_message, is_feedback), ("bot", bot_response, is_feedback)], message_id)
+        return message_id
+
+    def store_turns(self, turns):
+        last_ids = self.store.store_turns(turns)
+        by_session = {}
+        for session_id, user_message, bot_response, is_feedback in turns:
+            by_session.setdefault(session_id, []).extend([("user", user_message, is_feedback),
+                                                          ("bot", bot_response, is_feedback)])
+        for session_id, messages in by_session.items():
+            self._append(session_id, messages, last_ids.get(session_id))
+        return last_ids
+
+    # --- pass-through ---
+    def create_tables(self):
+        return self.store.create_tables()
+
+    def create_session(self, session_id):
+        return self.store.create_session(session_id)
+
+    def run_lifecycle(self) -> dict:
+        summary = self.store.run_lifecycle()
+        # archived/dropped sessions must not be served from memory
+        with self._lock:
+            self._entries.clear()
+        return summary
+
+    def cache_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["sessions"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        stats["mode"] = self.mode
+        stats["max_sessions"] = self.max_sessions
+        return stats
+
+    def pool_stats(self) -> dict:
+        stats = self.store.pool_stats()
+        stats["session_cache"] = self.cache_stats()
+        return stats
@@ -1,154 +1,151 @@
-import os
-import psycopg2
-import time
-
-from psycopg2 import pool, sql
-from psycopg2.extras import RealDictCursor 
+import asyncio
 
+from utils.cached_session_store import CachedSessionStore
+from utils.chat_write_behind import TurnWriteBehind
 from utils.config import Config
+from utils.logging import get_logger
+from utils.session_store import SessionStore
 
 # Load config.ini
 config = Config()
-env = os.environ.get("APP_ENV", "dev")  # default to 'dev' if not specified
 
 # Read database config
-db_schema = config.get("db", f"{env}_schema")
-db_host = config.get("db", f"{env}_host")
-db_port = config.get("db", f"{env}_port")
-db_name = config.get("db", f"{env}_db_name")
-db_user = config.get("db", f"{env}_db_user")
-db_password = os.environ.get("PROD_DB_PWD" if env == "prod" else "DEV_DB_PWD")
-
-if not db_password:
-    raise ValueError(f"Database password not found in environment variable {'PROD_DB_PWD' if env == 'prod' else 'DEV_DB_PWD'}")
-
-# PostgreSQL DSN
-DATABASE_URL = f"postgresql://{db_user}:{db_password}@{db_host}/{db_name}?sslmode=require"
-print(f"DATABASE_URL: {DATABASE_URL}")
-
-# Connection pool (singleton-style)
-class Database:
-    _pool = None
-
-    def __init__(self, db_url=DATABASE_URL, minconn=1, maxconn=5):
-        if not Database._pool:
-            Database._pool = psycopg2.pool.SimpleConnectionPool(
-                minconn,
-                maxconn,
-                dsn=db_url,
-                cursor_factory=RealDictCursor
+db_backend = config.get("db", "backend", fallback="postgres").lower()
+db_write_behind = config.getboolean("db", "write_behind", fallback=False)
+db_lifecycle_interval = config.getfloat("db", "lifecycle_interval", fallback=3600)
+db_session_cache_mode = config.get("db", "session_cache_mode", fallback="sticky").lower()
+
+def create_session_store(backend: str = db_backend, cache_mode: str = db_session_cache_mode) -> SessionStore:
+    """
+    The session store selected by [db] backend: "postgres", "sqlite" or "memory", behind a
+    CachedSessionStore unless [db] session_cache_mode is "off".
+    Backends are imported on demand, so sqlite/memory need neither psycopg2 nor the database password.
+    """
+    if backend == "postgres":
+        from utils.postgres_session_store import PostgresSessionStore
+        store = PostgresSessionStore()
+    elif backend == "sqlite":
+        from utils.sqlite_session_store import SQLiteSessionStore
+        store = SQLiteSessionStore()
+    elif backend == "memory":
+        from utils.memory_session_store import InMemorySessionStore
+        store = InMemorySessionStore()
+    else:
+        raise ValueError(f"Unknown [db] backend: {backend}")
+
+    if cache_mode == "off":
+        return store
+    return CachedSessionStore(
+        store,
+        max_sessions=config.getint("db", "session_cache_max_sessions", fallback=1000),
+        ttl_seconds=config.getfloat("db", "session_cache_ttl_seconds", fallback=1800),
+        mode=cache_mode,
+    )
+
+class AsyncDatabase:
+    """
+    Async facade over a SessionStore for the FastAPI routes.
+    Each call runs in a worker thread (asyncio.to_thread), so database round trips no longer block the
+    event loop; concurrency is bounded by the pool size rather than serialized on the loop.
+    With write_behind, store_turn only queues the turn (see TurnWriteBehind) and reads of a session
+    include its queued turns.
+    """
+
+    def __init__(self, database: SessionStore = None, write_behind: bool = db_write_behind):
+        self.db = database or create_session_store()
+        self.debug = config.get("hr-demo", "debug").lower() == "true"
+        self.app_logger = get_logger(config.get("log", "app"))
+        self._loop = None       # the event loop the facade serves, set by start()
+        self.write_behind = None
+        if write_behind:
+            self.write_behind = TurnWriteBehind(
+                self.db.store_turns,
+                max_queue=config.getint("db", "write_behind_max_queue", fallback=1000),
+                batch_size=config.getint("db", "write_behind_batch_size", fallback=100),
+                flush_interval=config.getfloat("db", "write_behind_flush_interval", fallback=0.5),
             )
-        self.db_url = db_url
 
-    def _get_connection(self):
-        print(f"[DB] Getting connection for schema: {db_schema}")
-        retries = 3
-        for attempt in range(retries):
+    async def run_lifecycle(self) -> dict:
+        return await asyncio.to_thread(self.db.run_lifecycle)
+
+    async def run_lifecycle_loop(self, interval: float = db_lifecycle_interval):
+        while True:
             try:
-                conn = self._pool.getconn()
-                conn.autocommit = False
-                with conn.cursor() as cursor:
-                    cursor.execute(
-                        sql.SQL("SET search_path TO {}").format(sql.Identifier(db_schema))
-                    )
-                return conn
-            except psycopg2.OperationalError as e:
-                if attempt < retries - 1:
-                    time.sleep(1)
-                    continue
-                raise e
-
-    def _release_connection(self, conn):
-        print(f"[DB] Releasing connection for schema: {db_schema}")
-        self._pool.putconn(conn)
-
-    def create_tables(self):
-        conn = self._get_connection()
-        try:
-            with conn.cursor() as cursor:
-                 # Ensure schema exists
-                cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {db_schema};")
-                cursor.execute(f"SET search_path TO {db_schema};")
-
-                # Create sessions table
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS sessions (
-                        session_id TEXT PRIMARY KEY
-                    );
-                """)
-
-                # Create messages table
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS messages (
-                        message_id SERIAL PRIMARY KEY,
-                        session_id TEXT REFERENCES sessions(session_id),
-                        sender TEXT,
-                        message TEXT,
-                        is_feedback BOOLEAN DEFAULT FALSE
-                    );
-                """)
-                conn.commit()
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            self._release_connection(conn)
-
-    def create_session(self, session_id):
-        conn = self._get_connection()
-        try:
-            with conn.cursor() as cursor:
-                cursor.execute("""
-                    INSERT INTO sessions (session_id) 
-                    VALUES (%s)
-                    ON CONFLICT (session_id) DO NOTHING;
-                """, (session_id,))
-                conn.commit()
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            self._release_connection(conn)
-
-    def store_message(self, session_id, sender, message, is_feedback=False):
-        conn = self._get_connection()
-        try:
-            with conn.cursor() as cursor:
-                cursor.execute("""
-                    INSERT INTO messages (session_id, sender, message, is_feedback)
-                    VALUES (%s, %s, %s, %s);
-                """, (session_id, sender, message, is_feedback))
-                conn.commit()
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            self._release_connection(conn)
-
-    def fetch_session(self, session_id):
-        conn = self._get_connection()
+                summary = await self.run_lifecycle()
+                if self.debug:
+                    print(f"{self.__class__.__name__} lifecycle: {summary}")
+            except Exception as e:
+                self.app_logger.error(f"{self.__class__.__name__} lifecycle job failed: {e}")
+            await asyncio.sleep(interval)
+
+    def start(self):
+        """Start the write-behind flusher; call from inside the running event loop."""
+        self._loop = asyncio.get_running_loop()
+        if self.write_behind:
+            self.write_behind.start()
+
+    async def close(self):
+        if self.write_behind:
+            await self.write_behind.close()
+
+    async def create_tables(self):
+        return await asyncio.to_thread(self.db.create_tables)
+
+    async def create_session(self, session_id):
+        return await asyncio.to_thread(self.db.create_session, session_id)
+
+    async def store_message(self, session_id, sender, message, is_feedback=False):
+        return await asyncio.to_thread(self.db.store_message, session_id, sender, message, is_feedback)
+
+    async def store_turn(self, session_id, user_message, bot_response, is_feedback=False):
+        if self.write_behind:
+            return await self.write_behind.enqueue(session_id, user_message, bot_response, is_feedback)
+        return await asyncio.to_thread(self.db.store_turn, session_id, user_message, bot_response, is_feedback)
+
+    async def fetch_session(self, session_id):
+        if not self.write_behind:
+            return await asyncio.to_thread(self.db.fetch_session, session_id)
+
+        snapshot = self.write_behind.snapshot(session_id)
+        session = await asyncio.to_thread(self.db.fetch_session, session_id)
+        session["history"] = self.write_behind.merge(snapshot, session["history"], lambda turn: [
+            {"user_message": turn["user_message"], "bot_response": ""},
+            {"user_message": "", "bot_response": turn["bot_response"]},
+        ])
+        return session
+
+    async def fetch_recent_turns(self, session_id, max_turns):
+        if not self.write_behind:
+            return await asyncio.to_thread(self.db.fetch_recent_turns, session_id, max_turns)
+
+        snapshot = [turn for turn in self.write_behind.snapshot(session_id) if not turn["is_feedback"]]
+        turns = await asyncio.to_thread(self.db.fetch_recent_turns, session_id, max_turns)
+        turns = self.write_behind.merge(snapshot, turns, lambda turn: [
+            {"user_message": turn["user_message"], "bot_response": turn["bot_response"]},
+        ])
+        return turns[-max_turns:] if max_turns > 0 else []
+
+    def fetch_recent_turns_blocking(self, session_id, max_turns):
+        """
+        fetch_recent_turns for code running in a worker thread (e.g. under asyncio.to_thread): the read runs
+        on the event loop, so turns still queued in write-behind are included. Never call it on the loop.
+        """
+        if self._loop is None:
+            # not started: nothing can be queued yet
+            return self.db.fetch_recent_turns(session_id, max_turns)
         try:
-            with conn.cursor() as cursor:
-                cursor.execute("SELECT session_id FROM sessions WHERE session_id = %s", (session_id,))
-                row = cursor.fetchone()
-                if row:
-                    cursor.execute("""
-                        SELECT sender, message 
-                        FROM messages 
-                        WHERE session_id = %s 
-                        ORDER BY message_id ASC;
-                    """, (session_id,))
-                    history = []
-                    for msg in cursor.fetchall():
-                        history.append({
-                            "user_message": msg["message"] if msg["sender"] == "user" else "",
-                            "bot_response": msg["message"] if msg["sender"] == "bot" else ""
-                        })
-                    return {"session_id": session_id, "history": history}
-                else:
-                    return {"session_id": session_id, "history": []}
-        finally:
-            self._release_connection(conn)
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self._loop:
+            raise RuntimeError(f"{self.__class__.__name__} fetch_recent_turns_blocking called on the event loop")
+        return asyncio.run_coroutine_threadsafe(self.fetch_recent_turns(session_id, max_turns), self._loop).result()
+
+    def pool_stats(self) -> dict:
+        stats = self.db.pool_stats()
+        if self.write_behind:
+            stats["write_behind"] = self.write_behind.stats()
+        return stats
 
 class ChatMessage:
     def __init__(self, user_message=None, bot_response=None):
@@ -0,0 +1,151 @@
+# utils/chat_write_behind.py
+
+import asyncio
+import time
+
+from utils.config import Config
+from utils.logging import get_logger
+
+class TurnWriteBehind:
+    """
+    Write-behind persistence of chat turns.
+    enqueue() returns as soon as a turn is in a bounded in-process queue (it waits only when the queue is
+    full, which is the backpressure); a background task writes queued turns in batches with one multi-row
+    insert per batch. Until a turn is committed it is kept in a per-session overlay that merge() lays over
+    database reads, so a session always sees its own writes. close() flushes everything still queued.
+    Turns that are only in the queue are lost if the process dies; use it where that trade is acceptable.
+    """
+
+    def __init__(self, store_turns, max_queue: int = 1000, batch_size: int = 100, flush_interval: float = 0.5,
+                 max_retries: int = 3):
+        config = Config()
+        self.debug = config.get("hr-demo", "debug").lower() == "true"
+        self.app_logger = get_logger(config.get("log", "app"))
+
+        self.store_turns = store_turns      # sync (list of (session_id, user_message, bot_response, is_feedback))
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._pending = {}                  # session_id -> [turn dict], oldest first
+        self._task = None
+        self._stats = {"enqueued": 0, "flushed": 0, "batches": 0, "dropped": 0, "errors": 0, "queue_full_waits": 0}
+
+    # --- write path ---
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def enqueue(self, session_id, user_message, bot_response, is_feedback=False):
+        turn = {"session_id": session_id, "user_message": user_message, "bot_response": bot_response,
+                "is_feedback": is_feedback, "flushing": False}
+        self._pending.setdefault(session_id, []).append(turn)
+        if self._queue.full():
+            self._stats["queue_full_waits"] += 1
+        await self._queue.put(turn)
+        self._stats["enqueued"] += 1
+
+    async def _next_batch(self) -> tuple[list[dict], bool]:
+        """Wait for a turn, then collect more for up to flush_interval. Returns (batch, closing)."""
+        turn = await self._queue.get()
+        if turn is None:
+            return [], True
+
+        batch = [turn]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                turn = self._queue.get_nowait() if timeout <= 0 else await asyncio.wait_for(self._queue.get(), timeout)
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+            if turn is None:
+                return batch, True
+            batch.append(turn)
+        return batch, False
+
+    async def _run(self):
+        closing = False
+        while not closing:
+            batch, closing = await self._next_batch()
+            if batch:
+                await self._flush(batch)
+
+    async def _flush(self, batch: list[dict]):
+        for turn in batch:
+            turn["flushing"] = True
+        rows = [(t["session_id"], t["user_message"], t["bot_response"], t["is_feedback"]) for t in batch]
+
+        for attempt in range(self.max_retries):
+            try:
+                await asyncio.to_thread(self.store_turns, rows)
+                break
+            except Exception as e:
+                self._stats["errors"] += 1
+                self.app_logger.error(f"{self.__class__.__name__} batch of {len(batch)} turns failed (attempt {attempt + 1}): {e}")
+                if attempt + 1 < self.max_retries:
+                    await asyncio.sleep(0.5 * 2 ** attempt)
+        else:
+            await self._store_rows_individually(rows)
+
+        flushed = {id(turn) for turn in batch}
+        for session_id in {turn["session_id"] for turn in batch}:
+            pending = [turn for turn in self._pending.get(session_id, []) if id(turn) not in flushed]
+            if pending:
+                self._pending[session_id] = pending
+            else:
+                self._pending.pop(session_id, None)
+        self._stats["flushed"] += len(batch)
+        self._stats["batches"] += 1
+        if self.debug:
+            print(f"{self.__class__.__name__} flushed {len(batch)} turns")
+
+    async def _store_rows_individually(self, rows: list[tuple]):
+        """Fallback for a batch that keeps failing: one insert per turn, so only the bad turns are lost."""
+        for row in rows:
+            try:
+                await asyncio.to_thread(self.store_turns, [row])
+            except Exception as e:
+                self._stats["errors"] += 1
+                self._stats["dropped"] += 1
+                self.app_logger.error(f"{self.__class__.__name__} dropped turn {row}: {e}")
+
+    async def close(self, timeout: float = 30):
+        """Flush every queued turn and stop the background task."""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            self.app_logger.error(f"{self.__class__.__name__} shutdown flush timed out, {self._queue.qsize()} turns unwritten")
+        self._task = None
+
+    # --- read path ---
+    def snapshot(self, session_id) -> list[dict]:
+        """Take before reading the database; pass the result to merge() with what the database returned."""
+        return [dict(turn) for turn in self._pending.get(session_id, [])]
+
+    @staticmethod
+    def merge(snapshot: list[dict], rows: list[dict], to_rows) -> list[dict]:
+        """
+        Append the snapshot's turns to database rows. Turns that were being flushed while the database was
+        read may already be in rows; the longest such prefix of the snapshot that matches the tail of rows
+        is skipped. to_rows(turn) gives the row(s) a turn appears as in rows.
+        """
+        in_flight = 0
+        while in_flight < len(snapshot) and snapshot[in_flight]["flushing"]:
+            in_flight += 1
+
+        for skip in range(in_flight, 0, -1):
+            expected = [row for turn in snapshot[:skip] for row in to_rows(turn)]
+            if len(expected) <= len(rows) and rows[len(rows) - len(expected):] == expected:
+                return rows + [row for turn in snapshot[skip:] for row in to_rows(turn)]
+        return rows + [row for turn in snapshot for row in to_rows(turn)]
+
+    def stats(self) -> dict:
+        stats = dict(self._stats)
+        stats["queued"] = self._queue.qsize()
+        stats["pending_sessions"] = len(self._pending)
+        return stats
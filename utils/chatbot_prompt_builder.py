@@ -1,16 +1,31 @@
 # utils/chatbot_prompt_builder.py
 
+import hashlib
 import json
-import re
+import threading
 
 from pathlib import Path
 from string import Template
+from types import MappingProxyType
 from typing import Optional, Union
 
 from utils.config import Config
+from utils.keyword_matcher import KeywordMatcher
 from utils.logging import get_logger
 
 class ChatbotPromptBuilder:
+    """
+    Builds the system prompt ("### Assistant_Profile" block) for each chat mode.
+    The profile text of every mode is compiled once, at construction and on rebuild(), into a read-only
+    mapping of mode -> (text, sha256 hex digest). Requests only look their mode up in that mapping: no
+    string assembly on the hot path and no per-request state on the shared instance, so concurrent
+    requests cannot see each other's mode. rebuild() re-reads the profile files and swaps the mapping in
+    one assignment, so a request sees either the old or the new profiles, never a mix.
+    Mode and tag keywords come from the intent keywords file ([chatbot] intent_keywords_path) and are
+    compiled into one KeywordMatcher, rebuilt together with the profiles; the same file holds the per-mode
+    example queries (mode_examples) behind the embedding intent classifier.
+    """
+
     _instance = None
     _initialized = False
 
@@ -18,6 +33,9 @@ class ChatbotPromptBuilder:
     MODE_TECHNICAL = "technical"
     MODE_PERSONA = "persona"
 
+    TAG_ONTOLOGY = "ontology"
+    TAG_FOCUS = "focus"
+
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
@@ -32,8 +50,15 @@ class ChatbotPromptBuilder:
             self.bot_name = self.config.get("chatbot", "name")
             self.app_name = self.config.get("hr-demo", "name")
 
-            self.mode = ChatbotPromptBuilder.MODE_APP
+            self.mode = ChatbotPromptBuilder.MODE_APP     # default mode only; requests pass their own
             self._loaded_profiles = {}
+            self._profile_paths = set()
+            self.source_paths = ()     # files the last build read: intent keywords and profiles
+            self._rebuild_lock = threading.Lock()
+            self._compiled = MappingProxyType({})
+            self.keyword_matcher = None
+            self.mode_examples = MappingProxyType({})
+            self.rebuild()
 
             self.__class__._initialized = True
 
@@ -49,37 +74,40 @@ class ChatbotPromptBuilder:
     def is_request_for_chatbot_convo(cls, mode: str) -> bool:
         return mode == cls.MODE_PERSONA
 
-    def infer_mode_from_input(self, input: str) -> str:
-        input_lower = input.lower()
-        words = set(re.findall(r'\w+', input_lower))
-
-        app_specific_keywords = {
-            "advisor", "alarie", "aligning", "alignment", "america", "american", "app",
-            "china", "chinese", "demo", "developer", "developers", "document", "documents",
-            "documentation", "endpoint", "engineer", "engineers", "german", "germany",
-            "globaltech", "member", "members", "motivation", "ontologyone", "ontologyone's",
-            "project", "role", "roles", "singapore", "team", "timeline", "unified", "unifying",
-            "us", "usa", "version"
-        }
-
-        app_related_phrases = {"full stack", "the states", "use case"}
-
-        technical_keywords = {
-            "advantage", "advantages", "ai", "api", "architecture", "backend", "chatbot",
-            "cloud", "code", "database", "databases", "diagram", "diagrams", "disadvantage",
-            "disadvantages", "embedding", "embeddings", "fastapi", "framework", "frontend",
-            "graph", "image", "images", "inference", "knowledge", "language", "languages",
-            "layer", "layers", "llm", "markdown", "model", "models", "ontology", "ontologies",
-            "openai", "owl", "pic", "picture", "pictures", "prompt", "python", "quadstore",
-            "query", "rag", "rdf", "rdfs", "react", "reasoning", "semantic", "shacl", "sparql",
-            "store", "system", "swrl", "tech", "technical", "technology", "technologies",
-            "token", "tools", "triplestore", "turtle", "ui", "ux", "vector"
-        }
-
+    def _get_intent_keywords_path(self) -> Path:
+        return Path(self.config.get("chatbot", "intent_keywords_path", fallback="./intent_keywords.json")).resolve()
+
+    def _load_intent_keywords(self) -> dict:
+        # without keywords every message would route to persona mode and skip doc retrieval, so a missing
+        # or malformed file is an error: startup fails and a reload keeps the previous keyword table
+        intent_keywords_path = self._get_intent_keywords_path()
+        try:
+            with open(intent_keywords_path, "r", encoding="utf-8") as f:
+                intent_keywords = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            self.app_logger.error(f"{self.__class__.__name__} Error loading intent keywords {intent_keywords_path}: {e}")
+            raise ValueError(f"{self.__class__.__name__} Error loading intent keywords {intent_keywords_path}: {e}") from e
+
+        if not isinstance(intent_keywords, dict) or not isinstance(intent_keywords.get("MODE_KEYWORDS"), dict):
+            raise ValueError(f"{self.__class__.__name__} {intent_keywords_path} has no MODE_KEYWORDS mapping")
+        return intent_keywords
+
+    def _build_keyword_matcher(self, intent_keywords: dict) -> KeywordMatcher:
+        # mode labels are the mode names themselves, so a scan result can be read by mode
+        vocabularies = dict(intent_keywords.get("MODE_KEYWORDS", {}))
+        vocabularies[self.TAG_ONTOLOGY] = intent_keywords.get("ONTOLOGY_KEYWORDS", [])
+        vocabularies[self.TAG_FOCUS] = intent_keywords.get("FOCUS_KEYWORDS", [])
+        return KeywordMatcher(vocabularies)
+
+    def scan_keywords(self, text: str) -> dict:
+        """Mode keywords and ontology/focus tags found in text, in one pass: label -> set of keywords."""
+        return self.keyword_matcher.scan(text)
+
+    def infer_mode(self, matches: dict) -> str:
         mode = ChatbotPromptBuilder.MODE_PERSONA
-        if words & app_specific_keywords or any(phrase in input_lower for phrase in app_related_phrases):
+        if matches.get(ChatbotPromptBuilder.MODE_APP):
             mode = ChatbotPromptBuilder.MODE_APP
-        elif words & technical_keywords:
+        elif matches.get(ChatbotPromptBuilder.MODE_TECHNICAL):
             mode = ChatbotPromptBuilder.MODE_TECHNICAL
 
         if self.debug:
@@ -87,23 +115,56 @@ class ChatbotPromptBuilder:
 
         return mode
 
+    def infer_mode_from_input(self, input: str) -> str:
+        return self.infer_mode(self.scan_keywords(input))
+
     def get_mode(self):
         return self.mode
-    
+
+    def rebuild(self) -> dict:
+        """
+        Re-read the profile and intent keyword files and recompile them. Returns mode -> profile hash.
+        Raises ValueError on a missing or malformed intent keywords file; the previous build stays in use.
+        """
+        with self._rebuild_lock:
+            intent_keywords = self._load_intent_keywords()
+            keyword_matcher = self._build_keyword_matcher(intent_keywords)
+            mode_examples = MappingProxyType(intent_keywords.get("MODE_EXAMPLES", {}))
+            self._loaded_profiles = {}
+            self._profile_paths = set()
+            builders = {
+                self.MODE_APP: self.build_app_prompt,
+                self.MODE_TECHNICAL: self.build_technical_prompt,
+                self.MODE_PERSONA: self.build_persona_prompt,
+            }
+            compiled = {}
+            for mode, build in builders.items():
+                text = f"### Assistant_Profile\n{build()}"
+                compiled[mode] = (text, hashlib.sha256(text.encode("utf-8")).hexdigest())
+            self._compiled = MappingProxyType(compiled)
+            self.keyword_matcher = keyword_matcher
+            self.mode_examples = mode_examples
+            self.source_paths = (self._get_intent_keywords_path(), *sorted(self._profile_paths))
+
+        if self.debug:
+            print(f"{self.__class__.__name__} compiled profiles: {self.get_profile_hashes()}")
+        return self.get_profile_hashes()
+
+    def _get_compiled(self, chat_mode) -> tuple[str, str]:
+        try:
+            return self._compiled[chat_mode]
+        except KeyError:
+            raise ValueError(f"Unknown mode: {chat_mode}") from None
+
     def get_profile(self, chat_mode) -> str:
-        if chat_mode != self.mode:
-            self.mode = chat_mode
+        return self._get_compiled(chat_mode)[0]
 
-        if chat_mode == self.MODE_APP:
-            prompt = self.build_app_prompt()
-        elif chat_mode == self.MODE_TECHNICAL:
-            prompt = self.build_technical_prompt()
-        elif chat_mode == self.MODE_PERSONA:
-            prompt = self.build_persona_prompt()
-        else:
-            raise ValueError(f"Unknown mode: {chat_mode}")
+    def get_profile_hash(self, chat_mode) -> str:
+        """sha256 of the compiled profile text; changes exactly when the text does."""
+        return self._get_compiled(chat_mode)[1]
 
-        return f"### Assistant_Profile\n{prompt}"
+    def get_profile_hashes(self) -> dict:
+        return {mode: profile_hash for mode, (_, profile_hash) in self._compiled.items()}
 
     def get_user_prompt(self, user_message: str, doc_context: str, story_context: str, image_context, chat_history_context: str) -> str:
         context_list = []
@@ -145,6 +206,7 @@ class ChatbotPromptBuilder:
         merged = {}
         for fname in map(str.strip, file_names):
             path = profile_dir / fname
+            self._profile_paths.add(path)
             if not path.exists():
                 self.app_logger.error(f"Missing profile: {path}")
                 continue
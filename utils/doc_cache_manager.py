@@ -0,0 +1,292 @@
+# utils/doc_cache_manager.py
+
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+
+from filelock import AsyncFileLock, FileLock
+from pathlib import Path
+
+from utils.config import Config
+from utils.logging import get_logger
+
+class DocCacheManager:
+    """
+    Bookkeeping for the on-disk GitHub document cache.
+    Every cached file has a sidecar in {cache_dir}/.meta holding its source url, ETag/Last-Modified,
+    blob SHA (when known) and the time it was last validated. Entries are served straight from disk and
+    revalidated in the background with conditional requests, so edits in the library repo show up
+    within revalidate_interval seconds without adding download latency to the request path.
+    The cache is kept under max_bytes by evicting the least recently used files.
+    Files are written to a temp file and renamed into place, so readers never see a partial file, and
+    downloads of the same file are serialized across processes with a per-file lock.
+    """
+
+    META_DIR_NAME = ".meta"
+
+    def __init__(self, cache_dir: Path, http_get, max_bytes: int = 256 * 1024 * 1024,
+                 revalidate_interval: float = 600, max_concurrency: int = 4):
+        config = Config()
+        self.debug = config.get("hr-demo", "debug").lower() == "true"
+        self.app_logger = get_logger(config.get("log", "app"))
+
+        self.cache_dir = Path(cache_dir)
+        self.meta_dir = self.cache_dir / self.META_DIR_NAME
+        self.meta_dir.mkdir(parents=True, exist_ok=True)
+
+        self.http_get = http_get    # async (url, headers) -> httpx.Response
+        self.max_bytes = max_bytes
+        self.revalidate_interval = revalidate_interval
+        self.max_concurrency = max_concurrency
+
+        self.delete_listeners = []     # callables(path) run when an entry is deleted or evicted
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stale_hits": 0, "revalidated": 0,
+                       "refreshed": 0, "evictions": 0, "errors": 0}
+
+        # seed LRU order, byte accounting and validation times from whatever is already on disk;
+        # validation times are kept in memory so a cache hit never reads its sidecar
+        self._last_access = {}
+        self._sizes = {}
+        self._validated_at = {}     # path -> last validation time, for entries that have a sidecar
+        for path in self._content_files():
+            stat = path.stat()
+            self._last_access[path] = stat.st_mtime
+            self._sizes[path] = stat.st_size
+            meta = self.read_meta(path)
+            if meta:
+                self._validated_at[path] = meta.get("validated_at", 0)
+
+    # --- metadata sidecars ---
+    def _content_files(self) -> list[Path]:
+        return [path for path in self.cache_dir.iterdir() if path.is_file() and not path.name.startswith(".")]
+
+    def _meta_path(self, path: Path) -> Path:
+        return self.meta_dir / f"{Path(path).name}.json"
+
+    def read_meta(self, path: Path) -> dict:
+        try:
+            with open(self._meta_path(path), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def write_meta(self, path: Path, meta: dict):
+        self.write_atomic(self._meta_path(path), json.dumps(meta).encode("utf-8"))
+
+    @staticmethod
+    def write_atomic(path: Path, content: bytes):
+        """Write content to a temp file in the target directory and rename it over path."""
+        path = Path(path)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    # --- cross-process download locks ---
+    def _lock_path(self, path: Path) -> Path:
+        return self.meta_dir / f"{Path(path).name}.lock"
+
+    def file_lock(self, path: Path, timeout: float = 60) -> FileLock:
+        """Blocking per-file lock, for the sync download path."""
+        return FileLock(self._lock_path(path), timeout=timeout)
+
+    def async_file_lock(self, path: Path, timeout: float = 60) -> AsyncFileLock:
+        """Per-file lock that waits in an executor instead of blocking the event loop."""
+        return AsyncFileLock(self._lock_path(path), timeout=timeout)
+
+    # --- request path ---
+    def record_hit(self, path: Path):
+        path = Path(path)
+        now = time.time()
+        with self._lock:
+            validated_at = self._validated_at.get(path)
+            stale = bool(self.revalidate_interval) and validated_at is not None and now - validated_at > self.revalidate_interval
+            self._stats["hits"] += 1
+            if stale:
+                self._stats["stale_hits"] += 1
+            self._last_access[path] = now
+            if path not in self._sizes and path.exists():
+                self._sizes[path] = path.stat().st_size
+
+    def record_miss(self):
+        with self._lock:
+            self._stats["misses"] += 1
+
+    def store(self, path: Path, url: str, response, sha: str = None, touch: bool = True):
+        """Write a downloaded file and its sidecar, then enforce the byte budget."""
+        path = Path(path)
+        self.write_atomic(path, response.content)
+        self._record_stored(path, url, response, sha, touch)
+
+    def _record_stored(self, path: Path, url: str, response, sha: str = None, touch: bool = True):
+        meta = {
+            "url": url,
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+            "sha": sha,
+            "size": len(response.content),
+            "validated_at": time.time(),
+        }
+        self.write_meta(path, meta)
+        with self._lock:
+            # background refreshes keep the entry's place in the LRU order
+            if touch or path not in self._last_access:
+                self._last_access[path] = time.time()
+            self._sizes[path] = meta["size"]
+            self._validated_at[path] = meta["validated_at"]
+        self.enforce_budget()
+
+    # --- eviction ---
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def enforce_budget(self):
+        with self._lock:
+            total = sum(self._sizes.values())
+            if total <= self.max_bytes:
+                return
+            victims = []
+            for path in sorted(self._sizes, key=lambda p: self._last_access.get(p, 0)):
+                if total <= self.max_bytes:
+                    break
+                total -= self._sizes[path]
+                victims.append(path)
+
+        for path in victims:
+            self.delete(path)
+            with self._lock:
+                self._stats["evictions"] += 1
+            if self.debug:
+                print(f"{self.__class__.__name__} evicted {path}")
+
+    def delete(self, path: Path) -> bool:
+        path = Path(path)
+        existed = path.exists()
+        for file_path in (path, self._meta_path(path)):
+            try:
+                file_path.unlink()
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._sizes.pop(path, None)
+            self._last_access.pop(path, None)
+            self._validated_at.pop(path, None)
+        for listener in self.delete_listeners:
+            listener(path)
+        return existed
+
+    # --- revalidation ---
+    async def revalidate(self, path: Path) -> str:
+        """Conditionally re-fetch one entry. Returns "fresh", "refreshed", "deleted" or "error"."""
+        path = Path(path)
+        meta = self.read_meta(path)
+        url = meta.get("url")
+        if not url:
+            return "error"
+
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            response = await self.http_get(url, headers=headers)
+        except Exception as e:
+            self.app_logger.error(f"{self.__class__.__name__} revalidate {path.name} failed: {e}")
+            with self._lock:
+                self._stats["errors"] += 1
+            return "error"
+
+        if response.status_code == 304:
+            meta["validated_at"] = time.time()
+            self.write_meta(path, meta)
+            with self._lock:
+                self._validated_at[path] = meta["validated_at"]
+                self._stats["revalidated"] += 1
+            return "fresh"
+
+        if response.status_code == 200:
+            self.store(path, url, response, meta.get("sha"), touch=False)
+            with self._lock:
+                self._stats["refreshed"] += 1
+            self.app_logger.info(f"{self.__class__.__name__} refreshed {path.name}")
+            return "refreshed"
+
+        if response.status_code == 404:
+            self.delete(path)
+            self.app_logger.info(f"{self.__class__.__name__} {path.name} no longer exists upstream, removed")
+            return "deleted"
+
+        with self._lock:
+            self._stats["errors"] += 1
+        self.app_logger.error(f"{self.__class__.__name__} revalidate {path.name} got status {response.status_code}")
+        return "error"
+
+    async def revalidate_all(self, force: bool = False) -> dict:
+        """Revalidate every entry older than revalidate_interval (or all entries when force is set)."""
+        now = time.time()
+        paths = [path for path in self._content_files()
+                 if force or now - self.read_meta(path).get("validated_at", 0) > self.revalidate_interval]
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def _revalidate(path):
+            async with semaphore:
+                return await self.revalidate(path)
+
+        results = await asyncio.gather(*(_revalidate(path) for path in paths))
+        summary = {}
+        for result in results:
+            summary[result] = summary.get(result, 0) + 1
+        return summary
+
+    async def run_revalidation_loop(self):
+        # 0 disables revalidation, as in record_hit; sleep(0) would turn the loop into a busy loop
+        if self.revalidate_interval <= 0:
+            return
+        while True:
+            await asyncio.sleep(self.revalidate_interval)
+            try:
+                summary = await self.revalidate_all()
+                if self.debug:
+                    print(f"{self.__class__.__name__} revalidation: {summary}")
+            except Exception as e:
+                self.app_logger.error(f"{self.__class__.__name__} revalidation loop error: {e}")
+
+    # --- introspection ---
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._sizes)
+            stats["bytes"] = sum(self._sizes.values())
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+    def describe(self, path: Path) -> dict:
+        path = Path(path)
+        meta = self.read_meta(path)
+        with self._lock:
+            last_access = self._last_access.get(path)
+        return {
+            "path": str(path),
+            "size": meta.get("size", path.stat().st_size if path.exists() else 0),
+            "etag": meta.get("etag"),
+            "sha": meta.get("sha"),
+            "validated_at": meta.get("validated_at"),
+            "last_access": last_access,
+        }
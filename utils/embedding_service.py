@@ -2,24 +2,44 @@
 
 from utils.chatbot_prompt_builder import ChatbotPromptBuilder
 from utils.config import Config
+from utils.image_embedding_cache import ImageEmbeddingCache
 from utils.image_search_helper import ImageSearchHelper
+from utils.intent_classifier import IntentClassifier
 from utils.logging import get_logger
 from utils.pdf_document import PDFDocument
+from utils.settings import SettingsStore
 from utils.vector_db import VectorDB
 
 class EmbeddingService:
 
     def __init__(self):
         self.config = Config()
-        self.debug = self.config.get("hr-demo", "debug").lower() == "true"
+        self.settings_store = SettingsStore()
+        self.debug = self.settings_store.current.app.debug
         self.app_logger = get_logger(self.config.get("log", "app"))
 
         self.vectordb = VectorDB()
         
-        self.imageSearchHelper = ImageSearchHelper()
+        self.imageSearchHelper = ImageSearchHelper(vectordb=self.vectordb)
 
         self.chatbotPromptBuilder = ChatbotPromptBuilder()
 
+        self.intent_classifier = IntentClassifier(
+            ImageEmbeddingCache(
+                self.config.get("embedding", "intent_embedding_cache_dir", fallback="/tmp/intent_embedding_cache"),
+                self.config.get("embedding", "text_model")),
+            self._encode_texts,
+            min_score=self.settings_store.current.chatbot.intent_min_score,
+            margin=self.settings_store.current.chatbot.intent_margin)
+
+        self.settings_store.subscribe(self._apply_settings)
+
+    def _apply_settings(self, settings):
+        """Settings listener: take over the reloaded values this service keeps outside the snapshot."""
+        self.debug = settings.app.debug
+        self.intent_classifier.min_score = settings.chatbot.intent_min_score
+        self.intent_classifier.margin = settings.chatbot.intent_margin
+
     def set_document_text(self, file_bytes: str) -> str:
         """Extract all text from the entire document."""
         self.pdf_document = PDFDocument(pdf_bytes=file_bytes)
@@ -34,19 +54,40 @@ class EmbeddingService:
 
     def generate_text_embedding(self, text: str) -> list[float]:
         return self.vectordb.generate_embedding_for_text(text)
+
+    def _encode_texts(self, texts: list[str]):
+        return self.vectordb.text_model.encode([text.strip() for text in texts])
+
+    def classify_intent(self, query_vector: list[float], default: str) -> str:
+        """Chat mode whose example queries are closest to the query vector, or default when unsure."""
+        mode, score = self.intent_classifier.classify(query_vector, self.chatbotPromptBuilder.mode_examples)
+        if self.debug:
+            print(f"{self.__class__.__name__} classify_intent mode = {mode} (score {score:.4f}), default = {default}")
+        return mode or default
         
     def generate_image_embedding(self, text: str) -> list[float]:
         return self.vectordb.generate_embedding_for_image(text)
     
-    def search_image_embeddings(self, query:str) -> list[tuple]:
-        self.imageSearchHelper.update_context(query)
-        enriched_query = self.imageSearchHelper.enrich_query(query)
+    def set_image_context_history_loader(self, history_loader):
+        self.imageSearchHelper.set_history_loader(history_loader)
+
+    def get_keyword_normalizer(self):
+        return self.imageSearchHelper.keyword_normalizer
+
+    def search_image_embeddings(self, session_id:str, query:str, analysis=None) -> list[tuple]:
+        # with a QueryAnalysis the corrected query and its keywords are reused instead of recomputed
+        keywords = None
+        if analysis is not None:
+            enriched_query, keywords = self.imageSearchHelper.enrich_analyzed(
+                session_id, analysis.corrected_text, list(analysis.image_keywords))
+        else:
+            enriched_query = self.imageSearchHelper.enrich_query(session_id, query)
         if self.debug:
             print(f"\n{self.__class__.__name__} 📝 Interpreting as: {enriched_query}")
 
         # top_k_matches only has the top-k image matches
         # sorted_images has the full list of images
-        top_k_matches, sorted_images = self.imageSearchHelper.search(enriched_query)
+        top_k_matches, sorted_images = self.imageSearchHelper.search(enriched_query, keywords=keywords)
         if self.debug:
             for file_name, score, description in sorted_images:
                 print(f"{self.__class__.__name__} {file_name}: {score:.4f}")
@@ -73,16 +114,17 @@ class EmbeddingService:
         return image_matches
            
     def get_doc_namespace(self):
-        return self.config.get("vectordb", "doc_namespace")
+        return self.settings_store.current.vectordb.doc_namespace
     
     def get_stories_namespace(self):
-        return self.config.get("vectordb", "stories_namespace")
+        return self.settings_store.current.vectordb.stories_namespace
 
-    def get_top_k_text_embeddings(self, namespace:str, file_type:str, query:str, tags:list[str]=None) -> list[dict]:
-        query_emb = self.generate_text_embedding(query)
+    def get_top_k_text_embeddings(self, namespace:str, file_type:str, query:str, tags:list[str]=None,
+                                  query_vector:list[float]=None) -> list[dict]:
+        # callers that already embedded the query pass its vector to skip a second encode
+        query_emb = list(query_vector) if query_vector is not None else self.generate_text_embedding(query)
 
-        top_k_key = f"{file_type}_top_k"
-        top_k = int(self.config.get("vectordb", top_k_key))
+        top_k = self.settings_store.current.vectordb.top_k[file_type]
 
         metadata_filter = None
         if tags:
@@ -96,18 +138,18 @@ class EmbeddingService:
         return self.vectordb.search_text(namespace, query_emb, top_k, metadata_filter)
     
     def get_pass_threshold_text_embeddings(self, file_type:str, matches:list[dict]) -> list[dict]:
-        score_threshold_key = f"{file_type}_threshold"
-        score_threshold = float(self.config.get("vectordb", score_threshold_key))
+        score_threshold = self.settings_store.current.vectordb.thresholds[file_type]
 
         return self.vectordb.filter_matches_by_score(matches, score_threshold)
 
-    def search_text_embeddings(self, namespace:str, query:str, tags:list[str]=None) -> list[dict]:
+    def search_text_embeddings(self, namespace:str, query:str, tags:list[str]=None,
+                               query_vector:list[float]=None) -> list[dict]:
         file_type = namespace
         if namespace == "OntologyOne":
             file_type = "doc"
 
         # get the top k number of hits from the vector db
-        matches = self.get_top_k_text_embeddings(namespace, file_type, query, tags)
+        matches = self.get_top_k_text_embeddings(namespace, file_type, query, tags, query_vector)
         if self.debug:
             print(f"\n{self.__class__.__name__} matched {file_type}:")
             self.vectordb.simple_print_result(matches)
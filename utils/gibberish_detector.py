@@ -1,11 +1,38 @@
 import re
 import string
 
+from functools import lru_cache
+from pathlib import Path
+
+from utils.config import Config
+from utils.logging import get_logger
+from utils.ngram_gibberish_model import NgramGibberishModel
+
 class GibberishDetector:
+    """
+    Flags a message as gibberish when too many of its tokens are neither whitelisted, fillers nor word-like.
+    Two engines decide what is word-like:
+    - "wordfreq": a token must be a known English word. The vocabulary is loaded once when the detector is
+      created, so a plain alphabetic token is checked with a single set lookup, and the verdict of every token
+      is memoized: a chat repeats the same words all the time, so most tokens are answered from the cache.
+    - "ngram": the letters of a token must score above threshold under a character trigram model trained from
+      our docs, stories and English text (see utils/ngram_gibberish_model.py). New ontology terms and names
+      pass because they look like words, all tokens of a message are scored in one vectorized call, and only
+      an ~88 KB table is loaded. Digits and symbols keep the pattern rules. Falls back to wordfreq when the
+      model file is missing.
+    """
 
     QWERTY_ROWS = ["qwertyuiop", "asdfghjkl", "zxcvbnm"]
+    QWERTY_KEYS = frozenset("".join(QWERTY_ROWS))
+    PUNCTUATION = frozenset(string.punctuation)
     SAFE_SYMBOLS = {'.', ',', '!', '?', '-', ':'}
 
+    LONG_LETTER_RUN = re.compile(r'[a-zA-Z]{10,}')
+    LONG_DIGIT_RUN = re.compile(r'\d{5,}')
+    LETTER_DIGIT_SWITCH = re.compile(r'[^\W\d_](?=\d)|\d(?=[^\W\d_])')
+
+    ENGINES = ("wordfreq", "ngram")
+
     VALID_FILLERS = {"ah", "eh", "hmm", "huh", "mmm", "la", "lah", "leh", "lor", "meh", 
                      "oh", "ooh", "uh", "um"}
 
@@ -21,32 +48,115 @@ class GibberishDetector:
     GIBBERISH_RATIO = 0.3   # gibberish count / total word count"to", 
     SHORT_WORD_RATIO = 0.6  # short word countfgd / total word count
 
-    def __init__(self, threshold=GIBBERISH_RATIO):
+    def __init__(self, threshold=GIBBERISH_RATIO, cache_size: int = 8192, engine: str = "wordfreq",
+                 ngram_model_path: Path = None):
+        if engine not in self.ENGINES:
+            raise ValueError(f"{self.__class__.__name__} unknown engine {engine!r}, expected one of {self.ENGINES}")
+        config = Config()
+        self.app_logger = get_logger(config.get("log", "app"))
+
         self.threshold = threshold  # % of gibberish tokens to trigger True
+        self.ngram_model = self._load_ngram_model(ngram_model_path) if engine == "ngram" else None
+        self.engine = "ngram" if self.ngram_model is not None else "wordfreq"
+        if self.engine == "wordfreq":
+            self._vocabulary, self._word_frequency = self._load_vocabulary()
+        self._token_verdict = lru_cache(maxsize=cache_size)(self._token_verdict_uncached)
+        self._ngram_token_words = lru_cache(maxsize=cache_size)(self._ngram_token_words_uncached)
+
+    def _load_ngram_model(self, model_path: Path):
+        if model_path is None or not Path(model_path).exists():
+            self.app_logger.warning(f"{self.__class__.__name__} ngram model {model_path} not found, "
+                                    f"falling back to the wordfreq engine (train it with python -m utils.ngram_gibberish_model)")
+            return None
+        return NgramGibberishModel.load(model_path)
+
+    @staticmethod
+    def _load_vocabulary():
+        try:
+            from wordfreq import get_frequency_dict, word_frequency
+        except ImportError:
+            raise RuntimeError("wordfreq is not installed or available")
+
+        # keys of wordfreq's own cached English table: the same words word_frequency knows, without a second copy
+        return get_frequency_dict("en").keys(), word_frequency
 
-    def is_gibberish(self, text):
-        tokens = text.strip().split()
+    def is_gibberish(self, text, words=None):
+        # words: text.strip().split() when the caller already has it (QueryAnalysis.words)
+        tokens = list(words) if words is not None else text.strip().split()
 
         #if not tokens or len(text) < 5 or re.fullmatch(r'[a-zA-Z]{10,}', text):
-        if not tokens or re.fullmatch(r'[a-zA-Z]{10,}', text):
+        if not tokens or self.LONG_LETTER_RUN.fullmatch(text):
             return True
 
-        gibberish_count = 0
-        gibberish_tokens = []
+        if self.ngram_model is None:
+            gibberish_count = sum(1 for token in tokens if self._token_verdict(token.strip(string.punctuation)))
+        else:
+            gibberish_count = self._count_gibberish_ngram(tokens)
 
-        for token in tokens:
-            clean_token = token.strip(string.punctuation)
+        gibberish_ratio = gibberish_count / len(tokens)
+        return gibberish_ratio > self.threshold
+
+    def _token_verdict_uncached(self, clean_token):
+        # Check if token is in the whitelist (case insensitive)
+        if self._is_whitelisted(clean_token):
+            return False
+        return self._is_gibberish_token(clean_token)
 
-            # Check if token is in the whitelist (case insensitive)
-            if self._is_whitelisted(clean_token):
-                continue
+    def cache_info(self):
+        if self.ngram_model is not None:
+            return self._ngram_token_words.cache_info()
+        return self._token_verdict.cache_info()
 
-            if self._is_gibberish_token(clean_token):
+    def _count_gibberish_ngram(self, tokens):
+        gibberish_count = 0
+        words, owners = [], []  # letter runs still to score, and the index of the token each belongs to
+
+        for index, token in enumerate(tokens):
+            token_words = self._ngram_token_words(token)
+            if token_words is True:
                 gibberish_count += 1
-                gibberish_tokens.append(token)
+            elif token_words:
+                words.extend(token_words)
+                owners.extend([index] * len(token_words))
+
+        # one vectorized call for the whole message; a token is gibberish if any of its letter runs is
+        if words:
+            gibberish_count += len({owner for owner, flagged in zip(owners, self.ngram_model.is_gibberish(words)) if flagged})
+        return gibberish_count
+
+    def _ngram_token_words_uncached(self, token):
+        """True if the rules already call the token gibberish, else the letter runs the model has to score."""
+        clean_token = token.strip(string.punctuation)
+        if self._is_whitelisted(clean_token) or self._is_valid_filler(clean_token):
+            return ()
+
+        verdict = self._pattern_verdict(token, clean_token)
+        if verdict is None:
+            return tuple(self.ngram_model.LETTER_RUN.findall(clean_token))
+        return True if verdict else ()
+
+    def _pattern_verdict(self, token, clean_token):
+        """Verdict of the rules that do not need the model, or None when the token's letters decide."""
+        if not clean_token:
+            return self._is_symbols_only(token)
+        if clean_token.isdigit():
+            return self._has_long_digit_sequence(clean_token)
+        # "mp3", "covid19" and "2nd" switch between letters and digits once; "a1b2c3" and "xx99yy" keep switching
+        if self.LONG_DIGIT_RUN.search(clean_token) or len(self.LETTER_DIGIT_SWITCH.findall(clean_token)) > 1:
+            return True
+        if self._is_key_run_or_repeat(clean_token.lower()):
+            return True
+        return None
 
-        gibberish_ratio = gibberish_count / len(tokens)
-        return gibberish_ratio > self.threshold
+    def _is_key_run_or_repeat(self, token):
+        # the row and repetition rules of _is_keyboard_smash; its alternation heuristic fires on most long words
+        if len(token) >= 5 and any(token in row or token[::-1] in row for row in self.QWERTY_ROWS):
+            return True
+        if len(token) > 6:
+            for n in range(2, 5):
+                if token == token[:n] * (len(token) // n):
+                    return True
+        return False
 
     def _is_whitelisted(self, token):
         return token.lower() in self.WHITELIST
@@ -72,12 +182,10 @@ class GibberishDetector:
         return True  # If not known word and failed other checks, assume gibberish
 
     def _is_known_word(self, token):
-        try:
-            from wordfreq import word_frequency
-        except ImportError:
-            raise RuntimeError("wordfreq is not installed or available")
-
-        return word_frequency(token, lang="en") > 0
+        # wordfreq only lowercases plain ASCII words, so a vocabulary lookup gives the same answer
+        if token.isascii() and token.isalpha():
+            return token.lower() in self._vocabulary
+        return self._word_frequency(token, lang="en") > 0
 
     def _is_keyboard_smash(self, token):
         token = token.lower()
@@ -98,7 +206,7 @@ class GibberishDetector:
                     return True
 
         # Check for high alternation of left-to-right QWERTY keys
-        pattern = ''.join([c for c in token if any(c in row for row in self.QWERTY_ROWS)])
+        pattern = ''.join([c for c in token if c in self.QWERTY_KEYS])
         if len(pattern) >= 6 and self._looks_like_smash_pattern(pattern):
             return True
 
@@ -110,16 +218,16 @@ class GibberishDetector:
         return changes / len(token) > 0.6
 
     def _has_long_digit_sequence(self, token):
-        return bool(re.fullmatch(r'\d{5,}', token))
+        return bool(self.LONG_DIGIT_RUN.fullmatch(token))
 
     def _has_mixed_chars(self, token):
         has_letter = any(c.isalpha() for c in token)
         has_digit = any(c.isdigit() for c in token)
-        has_symbol = any(c in string.punctuation for c in token)
+        has_symbol = any(c in self.PUNCTUATION for c in token)
         return sum([has_letter, has_digit, has_symbol]) >= 2
 
     def _is_symbols_only(self, token):
-        return all(c in string.punctuation for c in token) and len(token) > 2
+        return all(c in self.PUNCTUATION for c in token) and len(token) > 2
 
     def _is_valid_filler(self, token):
         return token.lower() in self.VALID_FILLERS
\ No newline at end of file
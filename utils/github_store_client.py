@@ -1,13 +1,18 @@
 # utils/github_store_client.py
 
-import fitz 
+import asyncio
+import httpx
 import os
-import requests
+import threading
+import time
 
 from pathlib import Path
 
 from utils.config import Config
+from utils.doc_cache_manager import DocCacheManager
+from utils.image_url_resolver import ImageUrlResolver
 from utils.logging import get_logger
+from utils.page_text_store import PageTextStore
 
 github_token = os.environ.get("GITHUB_TOKEN")  # Set this as a secret env var in Render
 if not github_token:
@@ -16,9 +21,9 @@ if not github_token:
 DOC_SHA_URL = "credential_url"
 DOC_STORE = "documentstore"
 
-IMG_SHA_URL = "credential_url"
 IMG_STORE = "imagestore"
 IMG_FILE_URL = "url"
+IMG_PINNED_URL = "pinned_url"
 IMAGES_FOLDER = "images_folder"
 
 config = Config()
@@ -29,18 +34,111 @@ doc_store_project = config.get(DOC_STORE, "project")
 file_url_base_folder = config.get(DOC_STORE, "file_url_base_folder")
 file_url_child_folder = config.get(DOC_STORE, "file_url_child_folder")
 
+# bulk corpus sync through the git trees API
+doc_store_branch = config.get(DOC_STORE, "branch", fallback="main")
+tree_url = config.get(DOC_STORE, "tree_url")
+sync_interval = config.getfloat(DOC_STORE, "sync_interval", fallback=900)
+sync_concurrency = config.getint(DOC_STORE, "sync_concurrency", fallback=8)
+
 img_store_owner = config.get(IMG_STORE, "owner")
 img_store_repo = config.get(IMG_STORE, "repo")
 img_store_project = config.get(IMG_STORE, "project")
+img_store_branch = config.get(IMG_STORE, "branch", fallback="main")
 images_folder = config.get(IMG_STORE, IMAGES_FOLDER)
+commit_url = config.get(IMG_STORE, "commit_url")
 
 CACHE_DIR = Path("/tmp/github_docs_cache")  # Convert string to Path object
 CACHE_DIR.mkdir(parents=True, exist_ok=True)  # Now this works correctly
 
+# shared, pooled HTTP clients: connections to GitHub are kept alive and reused across requests
+http_timeout = config.getfloat(DOC_STORE, "http_timeout", fallback=10.0)
+http_max_connections = config.getint(DOC_STORE, "http_max_connections", fallback=10)
+http_retries = config.getint(DOC_STORE, "http_retries", fallback=3)
+http_retry_backoff = config.getfloat(DOC_STORE, "http_retry_backoff", fallback=0.5)
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_async_http_client = None
+_sync_http_client = None
+
+# in-flight downloads, so concurrent requests for the same file share one download
+_inflight_downloads = {}            # cached_file_path -> asyncio.Task
+_inflight_thread_locks = {}         # cached_file_path -> [threading.Lock, threads holding or waiting on it]
+_inflight_thread_locks_guard = threading.Lock()
+
 def _get_app_logger():
     config = Config()
     return get_logger(config.get("log", "app"))
 
+def _http_client_options() -> dict:
+    return {
+        "headers": {"Authorization": f"token {github_token}"},
+        "timeout": httpx.Timeout(http_timeout),
+        "limits": httpx.Limits(max_connections=http_max_connections,
+                               max_keepalive_connections=http_max_connections),
+        "follow_redirects": True,
+    }
+
+def get_async_http_client() -> httpx.AsyncClient:
+    global _async_http_client
+    if _async_http_client is None or _async_http_client.is_closed:
+        _async_http_client = httpx.AsyncClient(**_http_client_options())
+    return _async_http_client
+
+def _get_sync_http_client() -> httpx.Client:
+    global _sync_http_client
+    if _sync_http_client is None or _sync_http_client.is_closed:
+        _sync_http_client = httpx.Client(**_http_client_options())
+    return _sync_http_client
+
+async def close_http_clients():
+    global _async_http_client, _sync_http_client
+    if _async_http_client is not None:
+        await _async_http_client.aclose()
+        _async_http_client = None
+    if _sync_http_client is not None:
+        _sync_http_client.close()
+        _sync_http_client = None
+
+async def http_get(url: str, headers: dict = None) -> httpx.Response:
+    """GET through the shared async client, retrying transport errors and 429/5xx with exponential backoff."""
+    client = get_async_http_client()
+    for attempt in range(http_retries + 1):
+        try:
+            response = await client.get(url, headers=headers)
+            if response.status_code not in RETRY_STATUS_CODES or attempt == http_retries:
+                return response
+        except httpx.TransportError:
+            if attempt == http_retries:
+                raise
+        await asyncio.sleep(http_retry_backoff * (2 ** attempt))
+
+def _http_get_sync(url: str, headers: dict = None) -> httpx.Response:
+    client = _get_sync_http_client()
+    for attempt in range(http_retries + 1):
+        try:
+            response = client.get(url, headers=headers)
+            if response.status_code not in RETRY_STATUS_CODES or attempt == http_retries:
+                return response
+        except httpx.TransportError:
+            if attempt == http_retries:
+                raise
+        time.sleep(http_retry_backoff * (2 ** attempt))
+
+cache_manager = DocCacheManager(
+    CACHE_DIR,
+    http_get,
+    max_bytes=config.getint(DOC_STORE, "cache_max_bytes", fallback=256 * 1024 * 1024),
+    revalidate_interval=config.getfloat(DOC_STORE, "cache_revalidate_interval", fallback=600),
+)
+
+# PDF text is extracted once per cached file and served from a memory-mapped page store
+page_text_store = PageTextStore(
+    CACHE_DIR / ".pages",
+    workers=config.getint(DOC_STORE, "extract_workers", fallback=0),
+    parallel_min_pages=config.getint(DOC_STORE, "extract_parallel_min_pages", fallback=200),
+)
+cache_manager.delete_listeners.append(page_text_store.remove)
+
 def _fetch_doc_latest_commit_sha(filename:str) -> str:
     doc_store = DOC_STORE
     sha_url = DOC_SHA_URL
@@ -51,11 +149,8 @@ def _fetch_doc_latest_commit_sha(filename:str) -> str:
     return sha_url
 
 def _fetch_image_latest_commit_sha(filename:str) -> str:
-    doc_store = IMG_STORE
-    sha_url = IMG_SHA_URL
-
-    sha_url = _fetch_latest_commit_sha(doc_store, sha_url, 
-                                       img_store_owner, img_store_repo, img_store_project, filename)
+    # resolved in bulk from one tree listing instead of one commits API call per image
+    return image_url_resolver.get_commit_sha(filename)
 
 def _fetch_latest_commit_sha(doc_store:str, sha_url_template_key:str, 
                              owner:str, repo:str, project:str, filename:str) -> str:
@@ -65,9 +160,7 @@ def _fetch_latest_commit_sha(doc_store:str, sha_url_template_key:str,
                                                                   repo=repo,
                                                                   project=project,
                                                                   filename=filename))
-    headers = {"Authorization": f"token {github_token}"}
-    
-    response = requests.get(sha_url, headers=headers)
+    response = _http_get_sync(sha_url)
     if response.status_code == 200:
         latest_commit = response.json()[0]
         return latest_commit['sha']
@@ -98,27 +191,90 @@ def _get_formatted_cached_file_path(project:str, filename:str, folder:str=None)
 def _fetch_cached_file_path(project: str, file_name: str, folder:str) -> str:
     cached_file_path = _get_formatted_cached_file_path(project, file_name, folder)
     if cached_file_path.exists():   # return early if file is already cached
+        cache_manager.record_hit(cached_file_path)
         return cached_file_path
-    
-    # if cached file does not exist, fetch from GitHub and cache it
-    file_url = _fetch_file_url(file_name, folder)
 
-    # Include your GitHub token for private access
-    headers = {"Authorization": f"token {github_token}"}
-    response = requests.get(file_url, headers=headers)
+    with _inflight_thread_locks_guard:
+        entry = _inflight_thread_locks.setdefault(cached_file_path, [threading.Lock(), 0])
+        entry[1] += 1
+
+    try:
+        # one download per file: other threads wait on the thread lock, other processes on the file lock
+        with entry[0], cache_manager.file_lock(cached_file_path):
+            if cached_file_path.exists():   # downloaded while we were waiting
+                cache_manager.record_hit(cached_file_path)
+                return cached_file_path
+
+            # if cached file does not exist, fetch from GitHub and cache it
+            cache_manager.record_miss()
+            file_url = _fetch_file_url(file_name, folder)
+            response = _http_get_sync(file_url)
+
+            # Check if the request was successful
+            if response.status_code != 200:
+                raise FileNotFoundError(f"Failed to fetch {file_name} from GitHub (status {response.status_code})")
+
+            # Save the file locally in cache, along with its ETag for later revalidation
+            cache_manager.store(cached_file_path, file_url, response)
+    finally:
+        # the last thread out drops the lock, so the map only holds files being downloaded right now
+        with _inflight_thread_locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                _inflight_thread_locks.pop(cached_file_path, None)
 
-    # Check if the request was successful
-    if response.status_code != 200:
-        raise FileNotFoundError(f"Failed to fetch {file_name} from GitHub (status {response.status_code})")
+    return cached_file_path
+
+async def _fetch_cached_file_path_async(project: str, file_name: str, folder:str) -> str:
+    cached_file_path = _get_formatted_cached_file_path(project, file_name, folder)
+    if cached_file_path.exists():   # return early if file is already cached
+        cache_manager.record_hit(cached_file_path)
+        return cached_file_path
+
+    # single-flight: concurrent requests for the same file await the same download task.
+    # shield() keeps one cancelled request from cancelling the download for everyone else.
+    task = _inflight_downloads.get(cached_file_path)
+    if task is None:
+        task = asyncio.ensure_future(_download_to_cache(cached_file_path, file_name, folder))
+        _inflight_downloads[cached_file_path] = task
+        task.add_done_callback(lambda _: _inflight_downloads.pop(cached_file_path, None))
+    return await asyncio.shield(task)
+
+async def _download_to_cache(cached_file_path, file_name: str, folder: str):
+    # the file lock serializes downloads of the same file across uvicorn workers sharing CACHE_DIR
+    async with cache_manager.async_file_lock(cached_file_path):
+        if cached_file_path.exists():   # another worker downloaded it while we were waiting
+            cache_manager.record_hit(cached_file_path)
+            return cached_file_path
+
+        cache_manager.record_miss()
+        file_url = _fetch_file_url(file_name, folder)
+        response = await http_get(file_url)
 
-    # Save the file locally in cache
-    with open(cached_file_path, "wb") as f:
-        f.write(response.content)
+        if response.status_code != 200:
+            raise FileNotFoundError(f"Failed to fetch {file_name} from GitHub (status {response.status_code})")
+
+        cache_manager.store(cached_file_path, file_url, response)
 
     return cached_file_path
 
+async def fetch_cached_file_paths(project: str, files: list[tuple[str, str]]) -> list[str]:
+    """Fetch (file_name, folder) pairs concurrently over the pooled client; returns cached paths in order."""
+    return await asyncio.gather(*(
+        _fetch_cached_file_path_async(project, file_name, folder) for file_name, folder in files
+    ))
+
+def _fetch_pinned_image_url(commit_sha: str, file_name: str) -> str:
+    return config.get(IMG_STORE, IMG_PINNED_URL).format(owner=img_store_owner,
+                                                         repo=img_store_repo,
+                                                         sha=commit_sha,
+                                                         project=img_store_project,
+                                                         folder=images_folder,
+                                                         filename=file_name)
+
 def fetch_image_url(file_name:str) -> str:
-    return _fetch_file_url(file_name, images_folder)
+    """Commit-pinned (immutable) URL of an image, or the branch URL until its SHA has been resolved."""
+    return image_url_resolver.resolve(file_name)
 
 def fetch_cached_image_path(project:str, file_name:str) -> str:
     return _fetch_cached_file_path(project, file_name, images_folder)
@@ -131,34 +287,37 @@ def fetch_cached_story_file_path(project: str, file_name: str) -> str:
     folder = config.get(DOC_STORE, "stories_folder")
     return _fetch_cached_file_path(project, file_name, folder)
 
-def extract_pages_from_doc(filepath: str, pages: list[int] = None) -> str:
-    """Extracts text from a PDF by page (0-based), or entire file for non-PDFs or when pages is None."""
+async def fetch_cached_doc_paths(project: str, file_names: list[str]) -> list[str]:
+    return await fetch_cached_file_paths(project, [(file_name, None) for file_name in file_names])
+
+async def fetch_cached_story_file_paths(project: str, file_names: list[str]) -> list[str]:
+    folder = config.get(DOC_STORE, "stories_folder")
+    return await fetch_cached_file_paths(project, [(file_name, folder) for file_name in file_names])
+
+def extract_pages_from_doc(filepath: str, pages: list[int] = None, max_chars: int = None) -> str:
+    """
+    Extracts text from a PDF by page (0-based), or entire file for non-PDFs or when pages is None.
+    max_chars caps whole-document PDF reads; extraction stops once the budget is reached.
+    """
     path = Path(filepath)
     if path.suffix.lower() == ".pdf":
-        text = ""
-        with fitz.open(filepath) as doc:
-            if pages is None:
-                for page in doc:
-                    text += page.get_text() + "\n"
-            else:
-                for page_num in pages:
-                    page = doc.load_page(page_num)
-                    text += page.get_text() + "\n"
-        return text
+        return page_text_store.read(path, pages, max_chars)
     else:
         # Plain text or RDF (.ttl, .txt, etc.)
         return path.read_text(encoding="utf-8")
 
+def shutdown_page_extractor():
+    page_text_store.shutdown()
+
 def delete_cached_file(project: str, file_name: str, folder:str) -> bool:
     """Delete the cached PDF file for the given project and filename."""
     app_logger = _get_app_logger()
 
     # Construct the cached file path
-    cached_file_path = _fetch_cached_file_path(project, file_name, folder)                                        
-                                        
-    if cached_file_path.exists():
-        cached_file_path.unlink()
-        app_logger.error(f"github_store_client Deleted cached file: {cached_file_path}")
+    cached_file_path = _get_formatted_cached_file_path(project, file_name, folder)
+
+    if cache_manager.delete(cached_file_path):
+        app_logger.info(f"github_store_client Deleted cached file: {cached_file_path}")
         return True
     else:
         app_logger.error(f"github_store_client No cached file to delete: {cached_file_path}")
@@ -172,4 +331,131 @@ def list_cached_files(project: str, folder: str = None) -> list[str]:
         pattern = f"{project}__*"
 
     cached_files = list(CACHE_DIR.glob(pattern))
-    return [str(file) for file in cached_files if file.is_file()]
\ No newline at end of file
+    return [str(file) for file in cached_files if file.is_file()]
+
+def describe_cached_files(project: str, folder: str = None) -> list[dict]:
+    """list_cached_files with each entry's size, ETag/SHA, last validation and last access."""
+    return [cache_manager.describe(file) for file in list_cached_files(project, folder)]
+
+def get_cache_stats() -> dict:
+    return cache_manager.stats()
+
+async def revalidate_cached_files(force: bool = False) -> dict:
+    return await cache_manager.revalidate_all(force)
+
+async def run_cache_revalidation_loop():
+    await cache_manager.run_revalidation_loop()
+
+def is_corpus_sync_enabled() -> bool:
+    return config.getboolean(DOC_STORE, "sync_enabled", fallback=False)
+
+async def fetch_head_commit(owner: str, repo: str, ref: str) -> str:
+    url = commit_url.format(owner=owner, repo=repo, ref=ref)
+    response = await http_get(url, headers={"Accept": "application/vnd.github.sha"})
+    if response.status_code != 200:
+        raise RuntimeError(f"github_store_client Failed to fetch head commit {url} (status {response.status_code})")
+    return response.text.strip()
+
+async def fetch_project_tree(project: str = doc_store_project, ref: str = doc_store_branch,
+                             owner: str = doc_store_owner, repo: str = doc_store_repo) -> list[dict]:
+    """
+    List every blob under the project folder of owner/repo at ref with one git trees API call.
+    Returns dicts with path (relative to the project folder), folder, file_name and sha (blob SHA).
+    """
+    url = tree_url.format(owner=owner, repo=repo, ref=ref)
+    response = await http_get(url, headers={"Accept": "application/vnd.github+json"})
+    if response.status_code != 200:
+        raise RuntimeError(f"github_store_client Failed to fetch tree {url} (status {response.status_code})")
+
+    tree = response.json()
+    if tree.get("truncated"):
+        _get_app_logger().warning(f"github_store_client tree for {repo} is truncated; some files will not be synced")
+
+    blobs = []
+    prefix = f"{project}/"
+    for entry in tree.get("tree", []):
+        if entry.get("type") != "blob" or not entry["path"].startswith(prefix):
+            continue
+        parts = entry["path"][len(prefix):].split("/")
+        if len(parts) > 2:      # the cache layout only has one folder level
+            continue
+        folder, file_name = (parts[0], parts[1]) if len(parts) == 2 else (None, parts[0])
+        blobs.append({"path": "/".join(parts), "folder": folder, "file_name": file_name, "sha": entry["sha"]})
+    return blobs
+
+async def _sync_file(cached_file_path: Path, file_url: str, sha: str) -> str:
+    async with cache_manager.async_file_lock(cached_file_path):
+        if cached_file_path.exists() and cache_manager.read_meta(cached_file_path).get("sha") == sha:
+            return "unchanged"
+
+        response = await http_get(file_url)
+        if response.status_code != 200:
+            _get_app_logger().error(f"github_store_client sync {file_url} failed (status {response.status_code})")
+            return "error"
+
+        cache_manager.store(cached_file_path, file_url, response, sha=sha, touch=False)
+        return "downloaded"
+
+async def sync_corpus(project: str = doc_store_project) -> dict:
+    """
+    Mirror the project folder (docs, stories, images) into the cache.
+    One tree request lists every blob with its SHA; only files whose SHA differs from the cached copy are
+    downloaded (concurrently, each written atomically), and cached files removed upstream are deleted.
+    """
+    app_logger = _get_app_logger()
+    blobs = await fetch_project_tree(project)
+
+    semaphore = asyncio.Semaphore(sync_concurrency)
+
+    async def _sync(blob):
+        async with semaphore:
+            cached_file_path = _get_formatted_cached_file_path(project, blob["file_name"], blob["folder"])
+            file_url = _fetch_file_url(blob["file_name"], blob["folder"])
+            return await _sync_file(cached_file_path, file_url, blob["sha"])
+
+    # one failed download must not abandon the rest of the corpus
+    results = await asyncio.gather(*(_sync(blob) for blob in blobs), return_exceptions=True)
+    summary = {}
+    for blob, result in zip(blobs, results):
+        if isinstance(result, Exception):
+            app_logger.error(f"github_store_client sync {blob['path']} failed: {result!r}")
+            result = "error"
+        summary[result] = summary.get(result, 0) + 1
+
+    # drop synced files that no longer exist upstream
+    upstream = {str(_get_formatted_cached_file_path(project, blob["file_name"], blob["folder"])) for blob in blobs}
+    for cached_file in list_cached_files(project):
+        if cached_file not in upstream and cache_manager.read_meta(Path(cached_file)).get("sha"):
+            cache_manager.delete(Path(cached_file))
+            summary["deleted"] = summary.get("deleted", 0) + 1
+
+    if cache_manager.total_bytes() > cache_manager.max_bytes:
+        app_logger.warning(f"github_store_client corpus exceeds cache_max_bytes ({cache_manager.max_bytes}); raise it to keep the corpus resident")
+    app_logger.info(f"github_store_client corpus sync {project}: {summary}")
+    return summary
+
+image_url_resolver = ImageUrlResolver(
+    CACHE_DIR / ".image_pins.json",
+    _fetch_pinned_image_url,
+    lambda file_name: _fetch_file_url(file_name, images_folder),
+    # the head commit and the tree listing must come from the same repo: the image store's
+    lambda: fetch_head_commit(img_store_owner, img_store_repo, img_store_branch),
+    lambda ref: fetch_project_tree(img_store_project, ref, img_store_owner, img_store_repo),
+    images_folder,
+    refresh_interval=config.getfloat(IMG_STORE, "pin_refresh_interval", fallback=300),
+)
+
+async def refresh_image_urls() -> dict:
+    return await image_url_resolver.refresh()
+
+async def run_image_url_refresh_loop():
+    await image_url_resolver.run_refresh_loop()
+
+async def run_corpus_sync_loop():
+    """Sync once at startup, then every sync_interval seconds."""
+    while True:
+        try:
+            await sync_corpus()
+        except Exception as e:
+            _get_app_logger().error(f"github_store_client corpus sync failed: {e}")
+        await asyncio.sleep(sync_interval)
\ No newline at end of file
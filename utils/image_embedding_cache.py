@@ -0,0 +1,82 @@
+# utils/image_embedding_cache.py
+
+import hashlib
+import os
+import re
+import tempfile
+
+import numpy as np
+
+from pathlib import Path
+
+from utils.config import Config
+from utils.logging import get_logger
+
+class ImageEmbeddingCache:
+    """
+    Persists the CLIP embedding matrix of the image catalog as a .npy file that is memory-mapped on load.
+    Files are keyed by the image model name and the hash of the metadata file, so editing the catalog
+    JSON or switching models yields a new key and the matrix is rebuilt on the next load.
+    """
+
+    def __init__(self, cache_dir: str, model_name: str):
+        config = Config()
+        self.debug = config.get("hr-demo", "debug").lower() == "true"
+        self.app_logger = get_logger(config.get("log", "app"))
+
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.model_name = model_name
+        self.model_slug = re.sub(r"[^\w.-]+", "_", model_name)
+
+    @staticmethod
+    def hash_file(file_path: str) -> str:
+        with open(file_path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def get_cache_path(self, metadata_hash: str) -> Path:
+        return self.cache_dir / f"{self.model_slug}__{metadata_hash[:16]}.npy"
+
+    def load(self, metadata_hash: str, texts: list[str], encode_fn) -> np.ndarray:
+        """
+        Return the (len(texts), dim) float32 embedding matrix for the catalog, memory-mapped from disk.
+        encode_fn(texts) is only called when no valid cache file exists for metadata_hash.
+        """
+        cache_path = self.get_cache_path(metadata_hash)
+        if cache_path.exists():
+            try:
+                embeddings = np.load(cache_path, mmap_mode="r")
+                if embeddings.ndim == 2 and embeddings.shape[0] == len(texts):
+                    if self.debug:
+                        print(f"{self.__class__.__name__} loaded catalog embeddings from {cache_path}")
+                    return embeddings
+                self.app_logger.warning(f"{self.__class__.__name__} {cache_path} has shape {embeddings.shape}, rebuilding")
+            except (OSError, ValueError) as e:
+                self.app_logger.error(f"{self.__class__.__name__} Failed to load {cache_path}, rebuilding: {e}")
+
+        embeddings = np.ascontiguousarray(encode_fn(texts), dtype=np.float32)
+        self._save(cache_path, embeddings)
+        self._remove_stale_files(cache_path)
+        self.app_logger.info(f"{self.__class__.__name__} built catalog embeddings {embeddings.shape} at {cache_path}")
+
+        return np.load(cache_path, mmap_mode="r")
+
+    def _save(self, cache_path: Path, embeddings: np.ndarray):
+        # write to a temp file in the same directory, then rename so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=f".{cache_path.stem}.", suffix=".npy")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, embeddings)
+            os.replace(tmp_path, cache_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def _remove_stale_files(self, current_path: Path):
+        for path in self.cache_dir.glob(f"{self.model_slug}__*.npy"):
+            if path != current_path:
+                try:
+                    path.unlink()
+                except OSError as e:
+                    self.app_logger.warning(f"{self.__class__.__name__} Could not remove stale {path}: {e}")
@@ -0,0 +1,73 @@
+# utils/image_index.py
+
+import numpy as np
+
+class ImageIndex:
+    """
+    In-memory similarity index over the image catalog.
+    Embeddings live in one contiguous float32 matrix; a search is a matrix-vector product
+    followed by an argpartition top-k, so cost stays linear in the catalog size with no per-item Python
+    work. Keyword masks (keyword -> boolean row mask) are precomputed from the descriptions so a search
+    can be restricted to images of a given ontology/focus without scanning the metadata.
+    """
+
+    def __init__(self, metadata: list[dict], embeddings: np.ndarray, keyword_fn=None):
+        if len(metadata) != len(embeddings):
+            raise ValueError(f"{self.__class__.__name__} {len(metadata)} metadata items but {len(embeddings)} embeddings")
+
+        self.file_names = [item["file_name"] for item in metadata]
+        self.descriptions = [item["description"] for item in metadata]
+        self.embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+
+        self.keyword_masks = {}
+        if keyword_fn:
+            for row, description in enumerate(self.descriptions):
+                for keyword in set(keyword_fn(description)):
+                    mask = self.keyword_masks.get(keyword)
+                    if mask is None:
+                        mask = self.keyword_masks[keyword] = np.zeros(len(self.descriptions), dtype=bool)
+                    mask[row] = True
+
+    def __len__(self):
+        return len(self.file_names)
+
+    def mask_for(self, keyword_groups: list[list[str]]):
+        """
+        Rows whose description matches at least one keyword of every non-empty group, e.g.
+        [ontology_keywords, focus_keywords]. Returns None (no filtering) if nothing would match.
+        """
+        mask = None
+        for keywords in keyword_groups:
+            group_masks = [self.keyword_masks[k] for k in keywords if k in self.keyword_masks]
+            if not group_masks:
+                continue
+            group_mask = np.logical_or.reduce(group_masks)
+            mask = group_mask if mask is None else mask & group_mask
+
+        if mask is None or not mask.any():
+            return None
+        return mask
+
+    def _scores(self, query_vector: np.ndarray, rows=None) -> np.ndarray:
+        embeddings = self.embeddings if rows is None else self.embeddings[rows]
+        return embeddings @ query_vector
+
+    def search(self, query_vector: np.ndarray, top_k: int, mask: np.ndarray = None) -> list[tuple]:
+        """Return up to top_k (file_name, score, description) tuples, best first."""
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+
+        rows = np.flatnonzero(mask) if mask is not None else None
+        scores = self._scores(query_vector, rows)
+
+        top_k = min(top_k, len(scores))
+        if top_k <= 0:
+            return []
+
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        top_rows = rows[top] if rows is not None else top
+
+        return [
+            (self.file_names[row], float(score), self.descriptions[row])
+            for row, score in zip(top_rows, scores[top])
+        ]
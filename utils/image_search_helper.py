@@ -2,14 +2,19 @@
 
 import json
 import os
-import re
+
+import numpy as np
 
 from utils.config import Config
+from utils.image_embedding_cache import ImageEmbeddingCache
+from utils.image_index import ImageIndex
+from utils.keyword_normalizer import KeywordNormalizer
 from utils.logging import get_logger
+from utils.session_context_store import SessionContextStore
 
 class ImageSearchHelper:
 
-    def __init__(self):
+    def __init__(self, vectordb=None):
         config = Config()
         self.debug = config.get("hr-demo", "debug").lower() == "true"
         self.app_name = config.get("hr-demo", "name")
@@ -23,23 +28,36 @@ class ImageSearchHelper:
         self.preprocess = None
         self.device = None
 
-        image_metadata_path = config.get("embedding", "image_metadata_path")
+        self.image_metadata_path = config.get("embedding", "image_metadata_path")
         image_search_config_path = config.get("embedding", "image_search_config_path")
 
-        self.metadata = None
-        try:
-            self.metadata = self.load_metadata(image_metadata_path)
-        except Exception as e:
-            raise
-
         self.image_search_config = self.load_metadata(image_search_config_path)
         self.ontology_keywords = set(self.image_search_config.get("ONTOLOGY_KEYWORDS", []))
         self.focus_keywords = set(self.image_search_config.get("FOCUS_KEYWORDS", []))
         self.canonical_keywords = sorted(self.ontology_keywords | self.focus_keywords)
         self.stopwords = set(self.image_search_config.get("STOPWORDS", []))
         self.manual_corrections = self.image_search_config.get("MANUAL_CORRECTIONS", {})
+        self.keyword_normalizer = KeywordNormalizer(self.image_search_config)
 
-        self.context = {}
+        # catalogs above REMOTE_INDEX_THRESHOLD images are searched in the Pinecone image index instead
+        self.vectordb = vectordb
+        self.image_namespace = config.get("vectordb", "image_namespace")
+        self.remote_index_threshold = self.image_search_config.get("REMOTE_INDEX_THRESHOLD", 20000)
+
+        self.metadata = None
+        self.tag_embeddings = None
+        self._metadata_mtime = None
+        self.embedding_cache = ImageEmbeddingCache(
+            config.get("embedding", "image_embedding_cache_dir", fallback="/tmp/image_embedding_cache"),
+            config.get("embedding", "image_model"))
+        self.load_catalog()
+
+        # image query context (last_location, last_focus) is tracked per chat session
+        self.history_loader = None
+        self.context_store = SessionContextStore(
+            max_sessions=config.getint("embedding", "image_context_max_sessions", fallback=1000),
+            ttl_seconds=config.getint("embedding", "image_context_ttl_seconds", fallback=3600),
+            loader=self._rebuild_context)
 
     def _load_clip_model(self):
         if self.clip is None or self.torch is None:
@@ -74,68 +92,109 @@ class ImageSearchHelper:
         except json.JSONDecodeError as e:
             raise ValueError(f"{self.__class__.__name__} Error decoding JSON from {json_file_path}: {e}")
 
-    def _extract_keywords(self, text, score_threshold=90):
-        import re
-        from rapidfuzz import fuzz, process
-
-        words = re.findall(r'\b\w+\b', text.lower())
-        keywords = []
-
-        for word in words:
-            if word in self.manual_corrections:
-                keywords.append(self.manual_corrections[word])
-                continue
-            if word in self.stopwords or len(word) <= 2:
-                continue
-
-            best_match = process.extractOne(
-                word,
-                self.canonical_keywords,
-                scorer=fuzz.token_sort_ratio,
-                score_cutoff=score_threshold
-            )
-            keywords.append(best_match[0] if best_match else word)
-
-        return keywords
-
-    def update_context(self, user_query):
-        keywords = self._extract_keywords(user_query)
+    def _uses_remote_index(self, metadata) -> bool:
+        return bool(self.vectordb) and len(metadata) > self.remote_index_threshold
+
+    def load_catalog(self):
+        """
+        (Re)load the image metadata and its precomputed tag embedding matrix.
+        Catalogs searched in the Pinecone image index get no local matrix: they are neither encoded nor held
+        in memory, only their descriptions are kept to label the remote matches.
+        """
+        metadata_mtime = os.stat(self.image_metadata_path).st_mtime_ns
+        metadata = self.load_metadata(self.image_metadata_path)
+
+        index, tag_embeddings = None, None
+        if not self._uses_remote_index(metadata):
+            metadata_hash = ImageEmbeddingCache.hash_file(self.image_metadata_path)
+            tag_texts = [item["description"] for item in metadata]
+            tag_embeddings = self.embedding_cache.load(metadata_hash, tag_texts, self._encode_catalog)
+
+            index = ImageIndex(metadata, tag_embeddings, self._extract_keywords)
+            tag_embeddings = index.embeddings
+        descriptions = {item["file_name"]: item["description"] for item in metadata}
+
+        # swap in one step so a concurrent search never pairs new metadata with an old index
+        self._catalog = (metadata, index, descriptions)
+        self.metadata, self.tag_embeddings = metadata, tag_embeddings
+        self._metadata_mtime = metadata_mtime
+
+    def _get_catalog(self):
+        # a stat per search is all it takes to pick up edits to the metadata JSON
+        if os.stat(self.image_metadata_path).st_mtime_ns != self._metadata_mtime:
+            self.app_logger.info(f"{self.__class__.__name__} {self.image_metadata_path} changed, reloading catalog")
+            self.load_catalog()
+        return self._catalog
+
+    def _extract_keywords(self, text):
+        return self.keyword_normalizer.extract_keywords(text)
+
+    def set_history_loader(self, history_loader):
+        """history_loader(session_id) -> list of the session's previous user messages, oldest first."""
+        self.history_loader = history_loader
+
+    def _context_updates(self, keywords) -> dict:
+        updates = {}
 
         matched_locations = [k for k in keywords if k in self.ontology_keywords]
         if matched_locations:
-            self.context["last_location"] = matched_locations[-1]
+            updates["last_location"] = matched_locations[-1]
 
         matched_focus = [k for k in keywords if k in self.focus_keywords]
         if matched_focus:
-            self.context["last_focus"] = matched_focus[-1]
+            updates["last_focus"] = matched_focus[-1]
 
-    def enrich_query(self, user_query):
-        tokens = re.findall(r"\w+|[^\w\s]", user_query, re.UNICODE)
-        corrected_tokens = [
-            self.manual_corrections.get(token.lower(), token) if token.isalnum() else token
-            for token in tokens
-        ]
-        corrected_query = " ".join(corrected_tokens)
+        return updates
 
-        keywords = self._extract_keywords(corrected_query)
+    def _rebuild_context(self, session_id, max_messages=10):
+        if not self.history_loader:
+            return None
+
+        context = {}
+        try:
+            for user_query in self.history_loader(session_id)[-max_messages:]:
+                context.update(self._context_updates(self._extract_keywords(user_query)))
+        except Exception as e:
+            self.app_logger.error(f"{self.__class__.__name__} Failed to rebuild context for session {session_id}: {e}")
+        return context
+
+    def get_context(self, session_id):
+        return self.context_store.get(session_id)
+
+    def enrich_query(self, session_id, user_query):
+        """
+        Enrich the query with the session's last ontology/focus keywords and record the ones it mentions.
+        Keywords are extracted once per query and shared by the enrichment and the context update.
+        """
+        corrected_query = self.keyword_normalizer.correct_query(user_query)
+        return self.enrich_analyzed(session_id, corrected_query, self._extract_keywords(corrected_query))[0]
+
+    def enrich_analyzed(self, session_id, corrected_query, keywords):
+        """
+        enrich_query for a query that is already corrected and keyword-extracted (QueryAnalysis).
+        Returns (enriched query, its keywords); the injected context values are canonical keywords.
+        """
+        context = self.context_store.get(session_id)
+        self.context_store.update(session_id, self._context_updates(keywords))
 
         parts = []
-        query_lower = corrected_query.lower()
-        pattern = rf"\b{re.escape(self.app_name.lower())}('s)?\b"
+        enriched_keywords = list(keywords)
         has_location_keyword = any(k in self.ontology_keywords for k in keywords)
         should_inject_ontology = not has_location_keyword
 
         if should_inject_ontology and not has_location_keyword:
-            if self.context.get("last_location"):
-                parts.append(self.context["last_location"])
+            if context.get("last_location"):
+                parts.append(context["last_location"])
+                enriched_keywords.insert(0, context["last_location"])
 
         parts.append(corrected_query)
 
         if not any(k in self.focus_keywords for k in keywords):
-            if self.context.get("last_focus"):
-                parts.append(self.context["last_focus"])
+            if context.get("last_focus"):
+                parts.append(context["last_focus"])
+                enriched_keywords.append(context["last_focus"])
 
-        return " ".join(parts)
+        return " ".join(parts), enriched_keywords
 
     def _embed_texts(self, texts):
         self._load_clip_model()
@@ -145,21 +204,62 @@ class ImageSearchHelper:
             embeddings /= embeddings.norm(dim=-1, keepdim=True)
         return embeddings
 
-    def search(self, enriched_query: str, top_k_hits: int = None):
+    def _encode_catalog(self, texts, batch_size=256):
+        batches = [self._embed_texts(texts[i:i + batch_size]).cpu().numpy()
+                   for i in range(0, len(texts), batch_size)]
+        return np.concatenate(batches).astype(np.float32)
+
+    def embed_query(self, query: str) -> np.ndarray:
+        return self._embed_texts([query])[0].cpu().numpy().astype(np.float32)
+
+    def _keyword_groups(self, query: str, keywords: list[str] = None) -> list[list[str]]:
+        if keywords is None:
+            keywords = self._extract_keywords(query)
+        return [[k for k in keywords if k in self.ontology_keywords],
+                [k for k in keywords if k in self.focus_keywords]]
+
+    def _search_remote(self, query_embedding, top_k, keyword_groups, descriptions) -> list[tuple]:
+        metadata_filter = None
+        tags = [k for group in keyword_groups for k in group]
+        if tags:
+            metadata_filter = {"tags": {"$in": tags}}
+
+        matches = self.vectordb.search_image(self.image_namespace, query_embedding.tolist(), top_k, metadata_filter)
+        results = []
+        for match in matches:
+            # search_image only names matches that carry an id
+            file_name = match.get("file_name")
+            if not file_name:
+                self.app_logger.warning(f"{self.__class__.__name__} Skipping image match without file_name: {match}")
+                continue
+            results.append((file_name, float(match.get("score", 0.0)),
+                            match.get("description") or descriptions.get(file_name, "")))
+        return sorted(results, key=lambda x: x[1], reverse=True)
+
+    def search(self, enriched_query: str, top_k_hits: int = None, keywords: list[str] = None):
+        """
+        Return (top-k matches above TOP_K_SCORE_THRESHOLD, best candidates sorted by score).
+        Only the best max(TOP_K_HITS, ACCEPTABLE_K_HITS) candidates are ranked; the rest of the catalog
+        is never sorted. keywords: the query's keywords when already known (from enrich_analyzed).
+        """
         top_k_score_threshold = self.image_search_config.get("TOP_K_SCORE_THRESHOLD", 0.8)
         if top_k_hits is None:
             top_k_hits = self.image_search_config.get("TOP_K_HITS", 3)
+        candidate_k = max(top_k_hits, self.get_acceptable_k_hits() or 0)
+
+        metadata, index, descriptions = self._get_catalog()
+        query_embedding = self.embed_query(enriched_query)
 
-        query_embedding = self._embed_texts([enriched_query])[0]
-        tag_texts = [item["description"] for item in self.metadata]
-        tag_embeddings = self._embed_texts(tag_texts)
-        similarities = (tag_embeddings @ query_embedding).cpu().numpy()
+        keyword_groups = []
+        if self.image_search_config.get("FILTER_BY_KEYWORDS", False):
+            keyword_groups = self._keyword_groups(enriched_query, keywords)
+
+        if index is None:
+            sorted_results = self._search_remote(query_embedding, candidate_k, keyword_groups, descriptions)
+        else:
+            mask = index.mask_for(keyword_groups) if keyword_groups else None
+            sorted_results = index.search(query_embedding, candidate_k, mask)
 
-        scored_results = [
-            (item["file_name"], float(score), item["description"])
-            for item, score in zip(self.metadata, similarities)
-        ]
-        sorted_results = sorted(scored_results, key=lambda x: x[1], reverse=True)
         filtered = [r for r in sorted_results if r[1] >= top_k_score_threshold]
 
         return (filtered[:top_k_hits] if len(filtered) > top_k_hits else filtered, sorted_results)
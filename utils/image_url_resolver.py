@@ -0,0 +1,96 @@
+# utils/image_url_resolver.py
+
+import asyncio
+import json
+import threading
+
+from pathlib import Path
+
+from utils.config import Config
+from utils.doc_cache_manager import DocCacheManager
+from utils.logging import get_logger
+
+class ImageUrlResolver:
+    """
+    Emits immutable, commit-pinned raw URLs for the diagrams in the images folder.
+    A refresh costs two GitHub API calls whatever the number of images: one for the branch head commit
+    and one tree listing of that commit. Each image stays pinned to the commit it was first seen at for as
+    long as its blob SHA is unchanged, so its URL only changes when the image itself changes; browsers and
+    CDNs can cache it forever and an updated diagram gets a new URL on the next refresh.
+    """
+
+    def __init__(self, pins_path: Path, pinned_url_fn, fallback_url_fn, fetch_head_commit, fetch_tree,
+                 folder: str, refresh_interval: float = 300):
+        config = Config()
+        self.debug = config.get("hr-demo", "debug").lower() == "true"
+        self.app_logger = get_logger(config.get("log", "app"))
+
+        self.pins_path = Path(pins_path)
+        self.pinned_url_fn = pinned_url_fn      # (commit_sha, file_name) -> immutable URL
+        self.fallback_url_fn = fallback_url_fn  # file_name -> branch URL, used until an image is pinned
+        self.fetch_head_commit = fetch_head_commit
+        self.fetch_tree = fetch_tree            # async (ref) -> [{"folder", "file_name", "sha"}, ...]
+        self.folder = folder
+        self.refresh_interval = refresh_interval
+
+        self._lock = threading.Lock()
+        self._head_commit = None
+        self._pins = self._load_pins()          # file_name -> {"blob": blob_sha, "commit": commit_sha}
+
+    def _load_pins(self) -> dict:
+        try:
+            with open(self.pins_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._head_commit = data.get("head_commit")
+            return data.get("pins", {})
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def resolve(self, file_name: str) -> str:
+        pin = self._pins.get(file_name)
+        if not pin:
+            return self.fallback_url_fn(file_name)
+        return self.pinned_url_fn(pin["commit"], file_name)
+
+    def get_commit_sha(self, file_name: str):
+        pin = self._pins.get(file_name)
+        return pin["commit"] if pin else None
+
+    async def refresh(self) -> dict:
+        head_commit = await self.fetch_head_commit()
+        if head_commit == self._head_commit:
+            return {"unchanged": len(self._pins)}
+
+        blobs = await self.fetch_tree(head_commit)
+        summary = {"unchanged": 0, "pinned": 0, "removed": 0}
+        pins = {}
+        for blob in blobs:
+            if blob["folder"] != self.folder:
+                continue
+            current = self._pins.get(blob["file_name"])
+            if current and current["blob"] == blob["sha"]:
+                pins[blob["file_name"]] = current
+                summary["unchanged"] += 1
+            else:
+                pins[blob["file_name"]] = {"blob": blob["sha"], "commit": head_commit}
+                summary["pinned"] += 1
+        summary["removed"] = len(set(self._pins) - set(pins))
+
+        # build a new dict and swap it in; readers never see a half-updated mapping
+        with self._lock:
+            self._pins = pins
+            self._head_commit = head_commit
+        data = {"head_commit": head_commit, "pins": pins}
+        DocCacheManager.write_atomic(self.pins_path, json.dumps(data).encode("utf-8"))
+
+        if self.debug:
+            print(f"{self.__class__.__name__} refreshed image pins at {head_commit}: {summary}")
+        return summary
+
+    async def run_refresh_loop(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.app_logger.error(f"{self.__class__.__name__} image pin refresh failed: {e}")
+            await asyncio.sleep(self.refresh_interval)
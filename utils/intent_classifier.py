@@ -0,0 +1,87 @@
+# utils/intent_classifier.py
+
+import hashlib
+import json
+import threading
+
+import numpy as np
+
+from utils.config import Config
+from utils.image_embedding_cache import ImageEmbeddingCache
+from utils.logging import get_logger
+
+class IntentClassifier:
+    """
+    Routes a query to a chat mode by cosine similarity between its text embedding and one centroid per mode,
+    the normalized mean embedding of that mode's example queries (MODE_EXAMPLES in the intent keywords file).
+    The example embeddings are encoded once and persisted by an ImageEmbeddingCache keyed by the text model
+    and the hash of the examples, so neither a restart nor an unchanged reload encodes them again.
+    classify() takes the query vector the caller already computed for retrieval: routing costs one small
+    matrix-vector product and no extra encode. A best score below min_score, or within margin of the
+    runner-up, is no decision.
+    """
+
+    def __init__(self, embedding_cache: ImageEmbeddingCache, encode_fn, min_score: float = 0.0, margin: float = 0.0):
+        config = Config()
+        self.debug = config.get("hr-demo", "debug").lower() == "true"
+        self.app_logger = get_logger(config.get("log", "app"))
+
+        self.embedding_cache = embedding_cache
+        self.encode_fn = encode_fn      # (texts) -> (len(texts), dim) array
+        self.min_score = min_score
+        self.margin = margin
+
+        self._lock = threading.Lock()
+        self._centroids = (None, (), None)     # (mode_examples they were built from, modes, (len(modes), dim) matrix)
+
+    @staticmethod
+    def hash_examples(mode_examples: dict) -> str:
+        return hashlib.sha256(json.dumps(dict(mode_examples), sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _get_centroids(self, mode_examples: dict) -> tuple:
+        # the examples mapping is replaced, never mutated, on reload: identity tells whether centroids are current
+        centroids = self._centroids
+        if centroids[0] is mode_examples:
+            return centroids
+
+        with self._lock:
+            if self._centroids[0] is mode_examples:
+                return self._centroids
+
+            examples_hash = self.hash_examples(mode_examples)
+            modes = tuple(mode for mode, examples in mode_examples.items() if examples)
+            texts = [example for mode in modes for example in mode_examples[mode]]
+            matrix = None
+            if texts:
+                embeddings = np.asarray(self.embedding_cache.load(examples_hash, texts, self.encode_fn), dtype=np.float32)
+                embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+                bounds = np.cumsum([0] + [len(mode_examples[mode]) for mode in modes])
+                matrix = np.stack([embeddings[start:stop].mean(axis=0) for start, stop in zip(bounds[:-1], bounds[1:])])
+                matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+
+            self._centroids = (mode_examples, modes, matrix)
+            if self.debug:
+                print(f"{self.__class__.__name__} built centroids for {modes} from {len(texts)} examples")
+            return self._centroids
+
+    def score(self, query_vector, mode_examples: dict) -> dict:
+        """Cosine similarity of the query to every mode centroid."""
+        _, modes, matrix = self._get_centroids(mode_examples)
+        if matrix is None:
+            return {}
+        query = np.asarray(query_vector, dtype=np.float32)
+        scores = matrix @ (query / (np.linalg.norm(query) or 1.0))
+        return dict(zip(modes, scores.tolist()))
+
+    def classify(self, query_vector, mode_examples: dict) -> tuple:
+        """(mode, score) of the closest centroid, or (None, score) when the decision is not clear enough."""
+        scores = self.score(query_vector, mode_examples)
+        if not scores:
+            return None, 0.0
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        mode, best = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else -1.0
+        if best < self.min_score or best - runner_up < self.margin:
+            return None, best
+        return mode, best
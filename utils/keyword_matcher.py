@@ -0,0 +1,83 @@
+# utils/keyword_matcher.py
+
+import re
+
+class KeywordMatcher:
+    """
+    Single-pass matcher for labelled keyword vocabularies (e.g. app/technical mode words, ontology and
+    focus tags), where a keyword is a word or a multi-word phrase.
+    The vocabularies are compiled once into an Aho-Corasick automaton over word tokens: a trie of keyword
+    token sequences with failure links, and at every node the (label, keyword) pairs that end there.
+    scan() lowercases and tokenizes the text once and takes one transition per token, so the cost of a
+    scan depends on the length of the text, not on how many keywords are configured.
+    """
+
+    TOKEN_PATTERN = re.compile(r"\w+")
+    ROOT = 0
+
+    def __init__(self, vocabularies: dict):
+        """vocabularies: label -> iterable of keywords; a keyword may carry several labels."""
+        self.labels = tuple(vocabularies)
+        self._goto = [{}]       # node -> {token: child node}
+        self._fail = [self.ROOT]
+        self._output = [()]     # node -> ((label, keyword), ...) ending at this node, failure chain included
+
+        for label, keywords in vocabularies.items():
+            for keyword in keywords:
+                self._add(label, keyword)
+        self._link()
+
+    def _add(self, label: str, keyword: str):
+        tokens = self.TOKEN_PATTERN.findall(keyword.lower())
+        if not tokens:
+            return
+        node = self.ROOT
+        for token in tokens:
+            child = self._goto[node].get(token)
+            if child is None:
+                child = len(self._goto)
+                self._goto.append({})
+                self._fail.append(self.ROOT)
+                self._output.append(())
+                self._goto[node][token] = child
+            node = child
+        self._output[node] += ((label, keyword),)
+
+    def _link(self):
+        # breadth first, so a node's failure target is always linked before the node itself
+        queue = list(self._goto[self.ROOT].values())
+        for node in queue:
+            for token, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail != self.ROOT and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(token, self.ROOT)
+                self._fail[child] = target if target != child else self.ROOT
+                self._output[child] += self._output[self._fail[child]]
+
+    def scan(self, text: str) -> dict:
+        """Every label mapped to the set of its keywords found in text (empty sets included)."""
+        return self.scan_tokens(self.TOKEN_PATTERN.findall(text.lower()))
+
+    def scan_tokens(self, tokens) -> dict:
+        """scan() for text that is already lowercased and split with TOKEN_PATTERN."""
+        found = {label: set() for label in self.labels}
+        goto, fail, output = self._goto, self._fail, self._output
+        node = self.ROOT
+        for token in tokens:
+            while node != self.ROOT and token not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(token, self.ROOT)
+            for label, keyword in output[node]:
+                found[label].add(keyword)
+        return found
+
+    @staticmethod
+    def merge(*scans: dict) -> dict:
+        """Label-wise union of several scan() results."""
+        merged = {}
+        for scan in scans:
+            for label, keywords in scan.items():
+                merged.setdefault(label, set()).update(keywords)
+        return merged
@@ -0,0 +1,72 @@
+# utils/keyword_normalizer.py
+
+import re
+
+from functools import lru_cache
+
+from rapidfuzz import fuzz, process
+
+class KeywordNormalizer:
+    """
+    Maps the words of a query onto the canonical image search keywords.
+    Built once from image_search_config.json: manual corrections, canonical keywords, stopwords and short
+    words resolve through a single dict lookup, and only the remaining words go through the fuzzy
+    matcher, whose verdicts are memoized so a word is fuzzy-matched at most once per process.
+    """
+
+    WORD_PATTERN = re.compile(r"\b\w+\b")
+    TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+    _SKIP = object()
+
+    def __init__(self, image_search_config: dict, score_threshold: int = 90, cache_size: int = 4096):
+        ontology_keywords = set(image_search_config.get("ONTOLOGY_KEYWORDS", []))
+        focus_keywords = set(image_search_config.get("FOCUS_KEYWORDS", []))
+        self.canonical_keywords = sorted(ontology_keywords | focus_keywords)
+        self.manual_corrections = image_search_config.get("MANUAL_CORRECTIONS", {})
+        self.score_threshold = score_threshold
+
+        # precedence mirrors the original per-word checks: corrections, then stopwords/short words, then fuzzy
+        exact = {keyword: keyword for keyword in self.canonical_keywords}
+        exact.update({word: self._SKIP for word in image_search_config.get("STOPWORDS", [])})
+        exact.update(self.manual_corrections)
+        self._exact = exact
+
+        self._fuzzy_match = lru_cache(maxsize=cache_size)(self._fuzzy_match_uncached)
+
+    def _fuzzy_match_uncached(self, word: str) -> str:
+        best_match = process.extractOne(
+            word,
+            self.canonical_keywords,
+            scorer=fuzz.token_sort_ratio,
+            score_cutoff=self.score_threshold
+        )
+        return best_match[0] if best_match else word
+
+    def normalize_word(self, word: str):
+        """Return the canonical form of a lowercased word, or None if the word should be ignored."""
+        keyword = self._exact.get(word)
+        if keyword is not None:
+            return None if keyword is self._SKIP else keyword
+        if len(word) <= 2:
+            return None
+        return self._fuzzy_match(word)
+
+    def extract_keywords(self, text: str) -> list[str]:
+        keywords = []
+        for word in self.WORD_PATTERN.findall(text.lower()):
+            keyword = self.normalize_word(word)
+            if keyword is not None:
+                keywords.append(keyword)
+        return keywords
+
+    def correct_query(self, text: str) -> str:
+        """Apply manual corrections token by token, keeping punctuation as separate tokens."""
+        tokens = self.TOKEN_PATTERN.findall(text)
+        return " ".join(
+            self.manual_corrections.get(token.lower(), token) if token.isalnum() else token
+            for token in tokens
+        )
+
+    def cache_info(self):
+        return self._fuzzy_match.cache_info()
@@ -0,0 +1,96 @@
+# utils/memory_session_store.py
+
+import itertools
+import threading
+import time
+
+from utils.config import Config
+from utils.session_store import SessionStore
+
+class InMemorySessionStore(SessionStore):
+    """
+    Process-local session store for tests, load tests and throwaway local runs; nothing survives a
+    restart and every worker process has its own sessions. The lifecycle job drops idle sessions
+    (there is no archive).
+    """
+
+    def __init__(self, session_ttl_days=None):
+        self._init_lifecycle(Config(), session_ttl_days, archive_retention_days=0)
+
+        self._lock = threading.Lock()
+        self._sessions = {}         # session_id -> {"created_at", "last_active_at"}
+        self._messages = {}         # session_id -> [{"message_id", "sender", "message", "is_feedback"}]
+        self._message_ids = itertools.count(1)
+
+    def create_tables(self):
+        pass
+
+    def create_session(self, session_id):
+        now = time.time()
+        with self._lock:
+            self._sessions.setdefault(session_id, {"created_at": now, "last_active_at": now})
+
+    def _append(self, session_id, sender, message, is_feedback, now):
+        session = self._sessions.setdefault(session_id, {"created_at": now, "last_active_at": now})
+        session["last_active_at"] = now
+        message_id = next(self._message_ids)
+        self._messages.setdefault(session_id, []).append({
+            "message_id": message_id, "sender": sender, "message": message, "is_feedback": is_feedback,
+        })
+        return message_id
+
+    def store_message(self, session_id, sender, message, is_feedback=False):
+        now = time.time()
+        with self._lock:
+            return self._append(session_id, sender, message, is_feedback, now)
+
+    def store_turns(self, turns):
+        now = time.time()
+        last_ids = {}
+        with self._lock:
+            for session_id, user_message, bot_response, is_feedback in turns:
+                self._append(session_id, "user", user_message, is_feedback, now)
+                last_ids[session_id] = self._append(session_id, "bot", bot_response, is_feedback, now)
+        return last_ids
+
+    def fetch_session(self, session_id):
+        with self._lock:
+            messages = list(self._messages.get(session_id, []))
+        return {"session_id": session_id, "history": [self.history_entry(msg["sender"], msg["message"]) for msg in messages]}
+
+    def fetch_last_message_id(self, session_id):
+        with self._lock:
+            messages = self._messages.get(session_id)
+            return messages[-1]["message_id"] if messages else None
+
+    def fetch_recent_turns(self, session_id, max_turns):
+        if max_turns <= 0:
+            return []
+
+        rows = []
+        with self._lock:
+            for msg in reversed(self._messages.get(session_id, [])):
+                if msg["is_feedback"]:
+                    continue
+                rows.append(msg)
+                if len(rows) == 2 * max_turns:
+                    break
+        return self.pair_turns(rows, max_turns)
+
+    def run_lifecycle(self) -> dict:
+        summary = {"sessions_dropped": 0, "messages_dropped": 0}
+        if not self.session_ttl_days:
+            return summary
+
+        cutoff = time.time() - self.session_ttl_days * 86400
+        with self._lock:
+            for session_id in [sid for sid, session in self._sessions.items() if session["last_active_at"] < cutoff]:
+                del self._sessions[session_id]
+                summary["messages_dropped"] += len(self._messages.pop(session_id, []))
+                summary["sessions_dropped"] += 1
+        return summary
+
+    def pool_stats(self) -> dict:
+        with self._lock:
+            return {"backend": "memory", "sessions": len(self._sessions),
+                    "messages": sum(len(messages) for messages in self._messages.values())}
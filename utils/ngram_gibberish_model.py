@@ -0,0 +1,195 @@
+# utils/ngram_gibberish_model.py
+#
+# Character trigram model used by GibberishDetector's "ngram" engine, and its offline trainer:
+#
+#   python -m utils.ngram_gibberish_model [--output gibberish_ngram_model.npz] [--corpus PATH ...]
+#                                         [--wordfreq-words 50000] [--threshold-percentile 1.0]
+
+import argparse
+import json
+import re
+import sys
+
+from pathlib import Path
+
+import numpy as np
+
+class NgramGibberishModel:
+    """
+    Smoothed character trigram log-probabilities over a 28-symbol alphabet (word boundary, a-z, any other
+    letter), held as one float32 array of 28^3 entries (~88 KB). A word scores the mean log-probability of
+    its characters, each given the two before it, with the word padded as "^^word$"; words that score below
+    the threshold calibrated at training time read as gibberish.
+    All the words of a message are scored in one call: they are encoded into a single code array, the
+    trigram log-probabilities are gathered with one fancy index and summed per word with one reduceat.
+    """
+
+    ALPHABET_SIZE = 28
+    BOUNDARY = 0
+    OTHER = 27
+    LETTER_RUN = re.compile(r"[^\W\d_]+")
+
+    # byte -> symbol; words are encoded as ASCII with "?" standing in for any non-ASCII letter
+    _CODES = np.full(256, OTHER, dtype=np.intp)
+    _CODES[0] = BOUNDARY
+    _CODES[ord("a"):ord("z") + 1] = np.arange(1, 27)
+
+    def __init__(self, log_probs: np.ndarray, threshold: float):
+        self.log_probs = np.ascontiguousarray(log_probs, dtype=np.float32)
+        self.threshold = float(threshold)
+
+        # in "\0\0word\0\0\0next\0" the only trigrams with two boundaries after a character are the two that
+        # straddle words; zeroing them lets reduceat sum each word's own trigrams without masking
+        self._scoring_log_probs = self.log_probs.copy()
+        self._scoring_log_probs[:, self.BOUNDARY, self.BOUNDARY] = 0.0
+
+    # --- persistence ---
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["log_probs"], float(data["threshold"]))
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            np.savez_compressed(f, log_probs=self.log_probs, threshold=np.float32(self.threshold))
+
+    # --- scoring ---
+    @classmethod
+    def _encode(cls, words: list[str]) -> tuple[np.ndarray, list[int], list[int]]:
+        """Codes of "\\0\\0word\\0" for every word back to back, with each word's offset and length."""
+        encoded = [word.lower().encode("ascii", "replace") for word in words]
+        lengths = [len(word) for word in encoded]
+        offsets = [0] * len(encoded)
+        for i in range(1, len(encoded)):
+            offsets[i] = offsets[i - 1] + lengths[i - 1] + 3
+        joined = b"\0\0" + b"\0\0\0".join(encoded) + b"\0"
+        return cls._CODES[np.frombuffer(joined, dtype=np.uint8)], offsets, lengths
+
+    def score(self, words: list[str]) -> np.ndarray:
+        """Mean log-probability per character transition of each word (higher is more word-like)."""
+        if not words:
+            return np.empty(0, dtype=np.float32)
+        codes, offsets, lengths = self._encode(words)
+        trigram_log_probs = self._scoring_log_probs[codes[:-2], codes[1:-1], codes[2:]]
+        # a word of n letters owns the n + 1 trigrams starting at its offset
+        return np.add.reduceat(trigram_log_probs, offsets) / (np.array(lengths) + 1)
+
+    def is_gibberish(self, words: list[str]) -> np.ndarray:
+        return self.score(words) < self.threshold
+
+    # --- training ---
+    @classmethod
+    def count_trigrams(cls, words) -> np.ndarray:
+        counts = np.zeros((cls.ALPHABET_SIZE,) * 3, dtype=np.float64)
+        words = list(words)
+        if words:
+            codes, offsets, lengths = cls._encode(words)
+            starts = np.concatenate([np.arange(offset, offset + length + 1) for offset, length in zip(offsets, lengths)])
+            np.add.at(counts, (codes[starts], codes[starts + 1], codes[starts + 2]), 1)
+        return counts
+
+    @classmethod
+    def from_counts(cls, counts: np.ndarray, weights=(0.6, 0.3, 0.1)) -> np.ndarray:
+        """Interpolate trigram, bigram and add-one unigram estimates into log P(c | a b)."""
+        trigram_weight, bigram_weight, unigram_weight = weights
+        bigram_counts = counts.sum(axis=0)                   # (b, c)
+        unigram_counts = bigram_counts.sum(axis=0)           # (c,)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            trigram = np.nan_to_num(counts / counts.sum(axis=2, keepdims=True))
+            bigram = np.nan_to_num(bigram_counts / bigram_counts.sum(axis=1, keepdims=True))
+        unigram = (unigram_counts + 1) / (unigram_counts.sum() + cls.ALPHABET_SIZE)
+
+        probs = trigram_weight * trigram + bigram_weight * bigram[np.newaxis] + unigram_weight * unigram
+        return np.log(probs).astype(np.float32)
+
+    @classmethod
+    def train(cls, words: list[str], threshold_percentile: float = 1.0):
+        model = cls(cls.from_counts(cls.count_trigrams(words)), threshold=0.0)
+        model.threshold = float(np.percentile(model.score(words), threshold_percentile))
+        return model
+
+# --- corpus readers for the trainer ---
+def _iter_json_strings(value):
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            yield key
+            yield from _iter_json_strings(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _iter_json_strings(item)
+
+def _iter_corpus_texts(path: Path):
+    if path.is_dir():
+        for child in sorted(path.iterdir()):
+            if not child.name.startswith("."):
+                yield from _iter_corpus_texts(child)
+        return
+    suffix = path.suffix.lower()
+    if suffix == ".pdf":
+        from utils.page_text_store import iter_page_texts
+        yield from iter_page_texts(path)
+    elif suffix == ".json":
+        with open(path, "r", encoding="utf-8") as f:
+            yield from _iter_json_strings(json.load(f))
+    elif suffix in (".txt", ".md"):
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            yield f.read()
+
+def corpus_words(paths: list[Path]) -> set[str]:
+    words = set()
+    for path in paths:
+        if not path.exists():
+            print(f"skipping missing corpus path {path}", file=sys.stderr)
+            continue
+        for text in _iter_corpus_texts(path):
+            words.update(word.lower() for word in NgramGibberishModel.LETTER_RUN.findall(text) if len(word) > 1)
+    return words
+
+def wordfreq_words(count: int) -> set[str]:
+    from wordfreq import iter_wordlist
+
+    words = set()
+    for word in iter_wordlist("en"):
+        if len(words) >= count:
+            break
+        if word.isalpha():
+            words.add(word)
+    return words
+
+def main():
+    repo_root = Path(__file__).resolve().parents[1]
+    parser = argparse.ArgumentParser(description="Train the character trigram model of the ngram gibberish engine.")
+    parser.add_argument("--output", type=Path, default=repo_root / "gibberish_ngram_model.npz")
+    parser.add_argument("--corpus", type=Path, nargs="*",
+                        default=[repo_root / "OntologyOne_images.json", repo_root / "chatbot_profiles",
+                                 repo_root / "chatbot_config.json", repo_root / "image_search_config.json",
+                                 Path("/tmp/github_docs_cache")],
+                        help="files or folders of .pdf/.txt/.md/.json text (our docs, stories, profiles)")
+    parser.add_argument("--wordfreq-words", type=int, default=50_000,
+                        help="number of the most frequent English words from wordfreq to add (0 = none)")
+    parser.add_argument("--threshold-percentile", type=float, default=1.0,
+                        help="percentile of training word scores below which a word reads as gibberish")
+    args = parser.parse_args()
+
+    domain_words = corpus_words(args.corpus)
+    english_words = wordfreq_words(args.wordfreq_words) if args.wordfreq_words else set()
+    words = sorted(domain_words | english_words)
+    if not words:
+        parser.error("no training words found")
+
+    model = NgramGibberishModel.train(words, args.threshold_percentile)
+    model.save(args.output)
+
+    rng = np.random.default_rng(0)
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    junk = ["".join(rng.choice(letters, rng.integers(4, 10))) for _ in range(5000)]
+    print(f"trained on {len(words)} words ({len(domain_words)} from the corpus, {len(english_words)} from wordfreq)")
+    print(f"threshold {model.threshold:.3f}; flags {model.is_gibberish(words).mean():.1%} of training words "
+          f"and {model.is_gibberish(junk).mean():.1%} of random letter strings")
+    print(f"saved {args.output} ({model.log_probs.nbytes / 1024:.0f} KB table)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+# utils/page_text_store.py
+
+import fitz
+import json
+import mmap
+import multiprocessing
+import os
+import threading
+
+from concurrent.futures import ProcessPoolExecutor
+from filelock import FileLock
+from pathlib import Path
+
+from utils.config import Config
+from utils.doc_cache_manager import DocCacheManager
+from utils.logging import get_logger
+
+def _extract_page_range(source_path: str, start: int, stop: int) -> list[bytes]:
+    """Worker for the process pool: text of pages [start, stop), one bytes chunk per page."""
+    with fitz.open(source_path) as doc:
+        return [(doc.load_page(page_num).get_text() + "\n").encode("utf-8") for page_num in range(start, stop)]
+
+def iter_page_texts(source_path, pages: list[int] = None):
+    """Yield page text (with its trailing newline) one page at a time, straight from the PDF."""
+    with fitz.open(source_path) as doc:
+        page_nums = range(doc.page_count) if pages is None else pages
+        for page_num in page_nums:
+            yield doc.load_page(page_num).get_text() + "\n"
+
+class PageTextStore:
+    """
+    Extract-once store of PDF page text.
+    The first read of a PDF extracts every page with PyMuPDF into {store_dir}/{name}.txt (UTF-8, each page
+    followed by a newline) plus {name}.idx.json holding the byte offset of every page and the size/mtime of
+    the source it was built from. Later reads memory-map the text file: a page lookup is a slice and a
+    whole-document read is one contiguous read. The extraction is rebuilt when the source file changes.
+    Documents with at least parallel_min_pages pages are extracted by a process pool, one page range per
+    worker. A budgeted whole-document read (max_chars) of a document that is not extracted yet streams
+    pages until the budget is met and leaves the full extraction to a background thread.
+    """
+
+    def __init__(self, store_dir: Path, workers: int = None, parallel_min_pages: int = 200):
+        config = Config()
+        self.debug = config.get("hr-demo", "debug").lower() == "true"
+        self.app_logger = get_logger(config.get("log", "app"))
+
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+
+        self.workers = workers or os.cpu_count() or 1
+        self.parallel_min_pages = parallel_min_pages
+        self._executor = None
+
+        self._entries = {}      # source path -> (signature, offsets, mmap or b"")
+        self._background_loads = set()  # source paths with a background extraction in flight
+        self._lock = threading.Lock()
+
+    def _text_path(self, source_path: Path) -> Path:
+        return self.store_dir / f"{source_path.name}.txt"
+
+    def _index_path(self, source_path: Path) -> Path:
+        return self.store_dir / f"{source_path.name}.idx.json"
+
+    @staticmethod
+    def _signature(source_path: Path) -> list:
+        stat = source_path.stat()
+        return [stat.st_size, stat.st_mtime_ns]
+
+    # --- build ---
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn, not fork: the server process has threads (and PyMuPDF state) that must not be forked
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _extract_chunks(self, source_path: Path) -> list[bytes]:
+        with fitz.open(source_path) as doc:
+            page_count = doc.page_count
+            if self.workers <= 1 or page_count < self.parallel_min_pages:
+                return [(page.get_text() + "\n").encode("utf-8") for page in doc]
+
+        # one contiguous page range per worker; results come back in submission order
+        range_size = -(-page_count // self.workers)
+        executor = self._get_executor()
+        futures = [executor.submit(_extract_page_range, str(source_path), start, min(start + range_size, page_count))
+                   for start in range(0, page_count, range_size)]
+        return [chunk for future in futures for chunk in future.result()]
+
+    def _extract(self, source_path: Path) -> tuple[bytes, list[int]]:
+        chunks = self._extract_chunks(source_path)
+        offsets = [0]
+        for chunk in chunks:
+            offsets.append(offsets[-1] + len(chunk))
+        return b"".join(chunks), offsets
+
+    def _build(self, source_path: Path, signature: list):
+        text, offsets = self._extract(source_path)
+
+        # text first, index last: a reader only trusts the text file once a matching index exists
+        DocCacheManager.write_atomic(self._text_path(source_path), text)
+        index = {"source_size": signature[0], "source_mtime_ns": signature[1], "offsets": offsets}
+        DocCacheManager.write_atomic(self._index_path(source_path), json.dumps(index).encode("utf-8"))
+
+        if self.debug:
+            print(f"{self.__class__.__name__} extracted {len(offsets) - 1} pages of {source_path.name}")
+
+    def _read_index(self, source_path: Path, signature: list):
+        try:
+            with open(self._index_path(source_path), "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if [index.get("source_size"), index.get("source_mtime_ns")] != signature:
+            return None
+        return index["offsets"]
+
+    def _get_loaded(self, source_path: Path):
+        """The in-memory entry if it is already loaded and current, without touching the index."""
+        with self._lock:
+            entry = self._entries.get(source_path)
+        if entry and entry[0] == self._signature(source_path):
+            return entry
+        return None
+
+    def is_extracted(self, source_path) -> bool:
+        source_path = Path(source_path)
+        return bool(self._get_loaded(source_path) or self._read_index(source_path, self._signature(source_path)))
+
+    def _load(self, source_path: Path):
+        signature = self._signature(source_path)
+
+        with self._lock:
+            entry = self._entries.get(source_path)
+        if entry and entry[0] == signature:
+            return entry
+
+        offsets = self._read_index(source_path, signature)
+        if offsets is None:
+            # serialize extraction of the same document across threads and worker processes
+            with FileLock(self.store_dir / f"{source_path.name}.lock", timeout=300):
+                offsets = self._read_index(source_path, signature)
+                if offsets is None:
+                    self._build(source_path, signature)
+                    offsets = self._read_index(source_path, signature)
+
+        with open(self._text_path(source_path), "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if offsets[-1] else b""
+
+        entry = (signature, offsets, data)
+        with self._lock:
+            previous = self._entries.get(source_path)
+            self._entries[source_path] = entry
+        # a rebuilt document replaces its mapping; release the old one instead of leaking it
+        if previous and previous is not entry:
+            self._close_entry(previous)
+        return entry
+
+    @staticmethod
+    def _close_entry(entry):
+        data = entry[2]
+        if isinstance(data, mmap.mmap):
+            data.close()
+
+    def _read_mapped(self, source_path: Path, read_fn):
+        """
+        read_fn(offsets, data) on the document's current entry. A reader that raced a rebuild or removal
+        finds its mapping closed; it retries once on the new entry.
+        """
+        for attempt in range(2):
+            _, offsets, data = self._load(source_path)
+            try:
+                return read_fn(offsets, data)
+            except ValueError:
+                if attempt == 0 and isinstance(data, mmap.mmap) and data.closed:
+                    continue
+                raise
+
+    def _load_in_background(self, source_path: Path):
+        """Start one background extraction per document; concurrent cold reads share it."""
+        with self._lock:
+            if source_path in self._background_loads:
+                return
+            self._background_loads.add(source_path)
+        threading.Thread(target=self._background_load, args=(source_path,), daemon=True).start()
+
+    def _background_load(self, source_path: Path):
+        try:
+            self._load(source_path)
+        except Exception as e:
+            self.app_logger.error(f"{self.__class__.__name__} background extraction of {source_path.name} failed: {e}")
+        finally:
+            with self._lock:
+                self._background_loads.discard(source_path)
+
+    # --- read ---
+    def read(self, source_path, pages: list[int] = None, max_chars: int = None) -> str:
+        """
+        Text of the given 0-based pages, or of the whole document when pages is None.
+        With max_chars, a whole-document read stops at the first page that reaches the budget and is
+        truncated to max_chars.
+        """
+        source_path = Path(source_path)
+        if pages is None and max_chars:
+            return self._read_budgeted(source_path, max_chars)
+
+        if pages is None:
+            return self._read_mapped(source_path, lambda offsets, data: data[:offsets[-1]].decode("utf-8"))
+
+        def read_pages(offsets, data):
+            page_count = len(offsets) - 1
+            chunks = []
+            for page_num in pages:
+                if not 0 <= page_num < page_count:
+                    raise ValueError(f"{self.__class__.__name__} page {page_num} not in {source_path.name} ({page_count} pages)")
+                chunks.append(data[offsets[page_num]:offsets[page_num + 1]])
+            return b"".join(chunks).decode("utf-8")
+
+        return self._read_mapped(source_path, read_pages)
+
+    def _read_budgeted(self, source_path: Path, max_chars: int) -> str:
+        if self.is_extracted(source_path):
+            return self._read_mapped(source_path, lambda offsets, data: self._take_budget(
+                (data[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)), max_chars))
+
+        # cold document: stream just enough pages now, extract the whole document off the request path
+        self._load_in_background(source_path)
+        return self._take_budget(iter_page_texts(source_path), max_chars)
+
+    @staticmethod
+    def _take_budget(page_texts, max_chars: int) -> str:
+        chunks = []
+        total = 0
+        for page_text in page_texts:
+            chunks.append(page_text)
+            total += len(page_text)
+            if total >= max_chars:
+                break
+        if hasattr(page_texts, "close"):
+            page_texts.close()
+        return "".join(chunks)[:max_chars]
+
+    def page_count(self, source_path) -> int:
+        return len(self._load(Path(source_path))[1]) - 1
+
+    def remove(self, source_path):
+        """Drop the extracted text of a source file, e.g. when it is evicted from the document cache."""
+        source_path = Path(source_path)
+        with self._lock:
+            entry = self._entries.pop(source_path, None)
+        if entry:
+            self._close_entry(entry)
+        for path in (self._text_path(source_path), self._index_path(source_path)):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
@@ -10,7 +10,7 @@ class PDFDocument:
         # Load document from bytes
         config = Config()
         self.app_logger = get_logger(config.get("log", "app"))
-        self.debug = self.config.get("hr-demo", "debug").lower() == "true"
+        self.debug = config.get("hr-demo", "debug").lower() == "true"
 
         self.doc = fitz.open(stream=pdf_bytes, filetype="pdf")
 
@@ -19,13 +19,14 @@ class PDFDocument:
         return self.doc.page_count
    
     def extract_pages_text(self, pages: list[int], footer_text: str = None) -> str:
-        text = ""
+        page_texts = []
         for page_num in pages:
             page = self.doc.load_page(page_num - 1)  # 0-indexed
-            page_text = page.fetch_text()
+            page_text = page.get_text()
             if footer_text and footer_text in page_text:
                 page_text = page_text.replace(footer_text, "").strip()
-            text += page_text + "\n"
+            page_texts.append(page_text + "\n")
+        text = "".join(page_texts)
 
         if self.debug:
             print(f"{self.__class__.__name__} text: {text}")
@@ -0,0 +1,551 @@
+# utils/postgres_session_store.py
+
+import datetime
+import os
+import re
+import psycopg2
+import threading
+import time
+
+from psycopg2 import pool, sql
+from psycopg2.extras import RealDictCursor, execute_values
+
+from utils.config import Config
+from utils.session_store import SessionStore
+
+def get_database_url(config: Config, env: str) -> str:
+    """PostgreSQL DSN for the APP_ENV environment; the password comes from PROD_DB_PWD / DEV_DB_PWD."""
+    password_var = "PROD_DB_PWD" if env == "prod" else "DEV_DB_PWD"
+    db_password = os.environ.get(password_var)
+    if not db_password:
+        raise ValueError(f"Database password not found in environment variable {password_var}")
+
+    db_host = config.get("db", f"{env}_host")
+    db_name = config.get("db", f"{env}_db_name")
+    db_user = config.get("db", f"{env}_db_user")
+    return f"postgresql://{db_user}:{db_password}@{db_host}/{db_name}?sslmode=require"
+
+# Connection pool (singleton-style)
+class PostgresSessionStore(SessionStore):
+    """
+    PostgreSQL session store on a thread-safe psycopg2 pool.
+    Checkouts are bounded by a semaphore sized to the pool, so a burst of requests waits for a free
+    connection instead of failing with PoolError; wait time and pool usage are exposed by pool_stats().
+    Statements use schema-qualified table names composed once here, so a checkout costs no extra
+    round trip for SET search_path.
+    Sessions are created lazily by the first stored message and carry created_at/last_active_at.
+    messages is range-partitioned by month on created_at (plus a DEFAULT partition); run_lifecycle()
+    keeps partitions created ahead of time, moves sessions idle for session_ttl_days with their
+    messages to the archive tables, purges old archive rows and drops past partitions that are empty
+    (or older than message_retention_months), so live tables and indexes stay bounded.
+    """
+
+    PARTITION_PATTERN = re.compile(r"^messages_p(\d{4})(\d{2})$")
+
+    # pg_advisory_xact_lock key held by every transaction that runs schema DDL (table creation, the legacy
+    # messages migration, partition creation/drop), so concurrent workers and lifecycle loops take turns
+    DDL_LOCK_KEY = 727_410_001
+
+    _pool = None
+    _pool_lock = threading.Lock()
+
+    def __init__(self, db_url=None, minconn=None, maxconn=None, schema=None, session_ttl_days=None,
+                 archive_retention_days=None, message_retention_months=None, partition_months_ahead=None):
+        config = Config()
+        env = os.environ.get("APP_ENV", "dev")  # default to 'dev' if not specified
+        db_url = db_url or get_database_url(config, env)
+        minconn = minconn or config.getint("db", "pool_min", fallback=1)
+        maxconn = maxconn or config.getint("db", "pool_max", fallback=10)
+        schema = schema or config.get("db", f"{env}_schema")
+
+        with PostgresSessionStore._pool_lock:
+            if not PostgresSessionStore._pool:
+                PostgresSessionStore._pool = psycopg2.pool.ThreadedConnectionPool(
+                    minconn,
+                    maxconn,
+                    dsn=db_url,
+                    cursor_factory=RealDictCursor
+                )
+                PostgresSessionStore._slots = threading.BoundedSemaphore(maxconn)
+                PostgresSessionStore._maxconn = maxconn
+                PostgresSessionStore._stats = {"checkouts": 0, "waits": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0, "in_use": 0}
+        self.db_url = db_url
+        self.schema = schema
+        self._init_lifecycle(config, session_ttl_days, archive_retention_days)
+        self.message_retention_months = (config.getint("db", "message_retention_months", fallback=0)
+                                         if message_retention_months is None else message_retention_months)
+        self.partition_months_ahead = (config.getint("db", "partition_months_ahead", fallback=2)
+                                       if partition_months_ahead is None else partition_months_ahead)
+
+        schema_id = sql.Identifier(schema)
+        sessions = sql.SQL("{}.sessions").format(schema_id)
+        messages = sql.SQL("{}.messages").format(schema_id)
+        messages_default = sql.SQL("{}.messages_default").format(schema_id)
+        messages_legacy = sql.SQL("{}.messages_legacy").format(schema_id)
+        sessions_archive = sql.SQL("{}.sessions_archive").format(schema_id)
+        messages_archive = sql.SQL("{}.messages_archive").format(schema_id)
+        touch_session = sql.SQL("""
+                INSERT INTO {sessions} (session_id)
+                VALUES (%s)
+                ON CONFLICT (session_id) DO UPDATE SET last_active_at = now();
+            """).format(sessions=sessions)
+        self._sql = {
+            "ddl_lock": sql.SQL("SELECT pg_advisory_xact_lock(%s);"),
+            "create_schema": sql.SQL("CREATE SCHEMA IF NOT EXISTS {};").format(schema_id),
+            "create_sessions": sql.SQL("""
+                CREATE TABLE IF NOT EXISTS {sessions} (
+                    session_id TEXT PRIMARY KEY,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    last_active_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                );
+                -- sessions created before lifecycle tracking get the upgrade time
+                ALTER TABLE {sessions} ADD COLUMN IF NOT EXISTS created_at TIMESTAMPTZ NOT NULL DEFAULT now();
+                ALTER TABLE {sessions} ADD COLUMN IF NOT EXISTS last_active_at TIMESTAMPTZ NOT NULL DEFAULT now();
+                CREATE INDEX IF NOT EXISTS sessions_last_active_at_idx ON {sessions} (last_active_at);
+            """).format(sessions=sessions),
+            "messages_kind": sql.SQL("""
+                SELECT c.relkind
+                FROM pg_class c
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname = %s AND c.relname = 'messages';
+            """),
+            # the primary key of a partitioned table must include the partition key
+            "create_messages": sql.SQL("""
+                CREATE TABLE IF NOT EXISTS {messages} (
+                    message_id BIGSERIAL,
+                    session_id TEXT REFERENCES {sessions}(session_id),
+                    sender TEXT,
+                    message TEXT,
+                    is_feedback BOOLEAN DEFAULT FALSE,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    PRIMARY KEY (message_id, created_at)
+                ) PARTITION BY RANGE (created_at);
+                CREATE TABLE IF NOT EXISTS {messages_default} PARTITION OF {messages} DEFAULT;
+                CREATE INDEX IF NOT EXISTS messages_session_id_message_id_idx
+                ON {messages} (session_id, message_id);
+            """).format(messages=messages, sessions=sessions, messages_default=messages_default),
+            # the legacy table keeps its rows under a new name; its constraint/index names are freed for the new
+            # table and its foreign key is dropped so archiving a session is not blocked by the frozen copy
+            "rename_legacy_messages": sql.SQL("""
+                ALTER TABLE {messages} RENAME TO messages_legacy;
+                ALTER TABLE {messages_legacy} RENAME CONSTRAINT messages_pkey TO messages_legacy_pkey;
+                ALTER TABLE {messages_legacy} DROP CONSTRAINT IF EXISTS messages_session_id_fkey;
+                ALTER INDEX IF EXISTS {schema}.messages_session_id_message_id_idx
+                RENAME TO messages_legacy_session_id_message_id_idx;
+            """).format(messages=messages, messages_legacy=messages_legacy, schema=schema_id),
+            "copy_legacy_messages": sql.SQL("""
+                INSERT INTO {messages} (message_id, session_id, sender, message, is_feedback, created_at)
+                SELECT message_id, session_id, sender, message, is_feedback, now()
+                FROM {messages_legacy};
+                SELECT setval(pg_get_serial_sequence(quote_ident(%s) || '.messages', 'message_id'),
+                              COALESCE((SELECT max(message_id) FROM {messages}), 0) + 1, false);
+            """).format(messages=messages, messages_legacy=messages_legacy),
+            "create_archive_tables": sql.SQL("""
+                CREATE TABLE IF NOT EXISTS {sessions_archive} (
+                    session_id TEXT PRIMARY KEY,
+                    created_at TIMESTAMPTZ,
+                    last_active_at TIMESTAMPTZ,
+                    archived_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                );
+                CREATE TABLE IF NOT EXISTS {messages_archive} (
+                    message_id BIGINT,
+                    session_id TEXT,
+                    sender TEXT,
+                    message TEXT,
+                    is_feedback BOOLEAN,
+                    created_at TIMESTAMPTZ,
+                    archived_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                );
+                CREATE INDEX IF NOT EXISTS messages_archive_session_id_message_id_idx
+                ON {messages_archive} (session_id, message_id);
+                CREATE INDEX IF NOT EXISTS messages_archive_archived_at_idx ON {messages_archive} (archived_at);
+                CREATE INDEX IF NOT EXISTS sessions_archive_archived_at_idx ON {sessions_archive} (archived_at);
+            """).format(sessions_archive=sessions_archive, messages_archive=messages_archive),
+            "list_partitions": sql.SQL("""
+                SELECT c.relname
+                FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                JOIN pg_class p ON p.oid = i.inhparent
+                JOIN pg_namespace n ON n.oid = p.relnamespace
+                WHERE n.nspname = %s AND p.relname = 'messages';
+            """),
+            "default_has_rows": sql.SQL("""
+                SELECT EXISTS (SELECT 1 FROM {messages_default} WHERE created_at >= %s AND created_at < %s) AS has_rows;
+            """).format(messages_default=messages_default),
+            "detach_default": sql.SQL("ALTER TABLE {messages} DETACH PARTITION {messages_default};").format(
+                messages=messages, messages_default=messages_default),
+            "attach_default": sql.SQL("ALTER TABLE {messages} ATTACH PARTITION {messages_default} DEFAULT;").format(
+                messages=messages, messages_default=messages_default),
+            "move_default_rows": sql.SQL("""
+                WITH moved AS (
+                    DELETE FROM {messages_default} WHERE created_at >= %s AND created_at < %s RETURNING *
+                )
+                INSERT INTO {messages} (message_id, session_id, sender, message, is_feedback, created_at)
+                SELECT message_id, session_id, sender, message, is_feedback, created_at FROM moved;
+            """).format(messages=messages, messages_default=messages_default),
+            # one statement per batch: NO ACTION foreign keys are checked at the end of the statement,
+            # so the sessions can be deleted alongside their messages
+            "archive_sessions": sql.SQL("""
+                WITH expired AS (
+                    SELECT session_id FROM {sessions}
+                    WHERE last_active_at < now() - make_interval(days => %s)
+                    ORDER BY last_active_at
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                ), moved_messages AS (
+                    DELETE FROM {messages} WHERE session_id IN (SELECT session_id FROM expired)
+                    RETURNING message_id, session_id, sender, message, is_feedback, created_at
+                ), archived_messages AS (
+                    INSERT INTO {messages_archive} (message_id, session_id, sender, message, is_feedback, created_at)
+                    SELECT * FROM moved_messages
+                    RETURNING 1
+                ), moved_sessions AS (
+                    DELETE FROM {sessions} WHERE session_id IN (SELECT session_id FROM expired)
+                    RETURNING session_id, created_at, last_active_at
+                ), archived_sessions AS (
+                    INSERT INTO {sessions_archive} (session_id, created_at, last_active_at)
+                    SELECT * FROM moved_sessions
+                    ON CONFLICT (session_id) DO UPDATE
+                    SET last_active_at = EXCLUDED.last_active_at, archived_at = now()
+                    RETURNING 1
+                )
+                SELECT (SELECT count(*) FROM archived_sessions) AS sessions,
+                       (SELECT count(*) FROM archived_messages) AS messages;
+            """).format(sessions=sessions, messages=messages,
+                         sessions_archive=sessions_archive, messages_archive=messages_archive),
+            "purge_archive": sql.SQL("""
+                DELETE FROM {messages_archive} WHERE archived_at < now() - make_interval(days => %s);
+                DELETE FROM {sessions_archive} WHERE archived_at < now() - make_interval(days => %s);
+            """).format(sessions_archive=sessions_archive, messages_archive=messages_archive),
+            "insert_session": sql.SQL("""
+                INSERT INTO {sessions} (session_id) 
+                VALUES (%s)
+                ON CONFLICT (session_id) DO NOTHING;
+            """).format(sessions=sessions),
+            "touch_sessions": sql.SQL("""
+                INSERT INTO {sessions} (session_id)
+                VALUES %s
+                ON CONFLICT (session_id) DO UPDATE SET last_active_at = now();
+            """).format(sessions=sessions),
+            # the session row is created by its first message and touched by every later one
+            "insert_message": touch_session + sql.SQL("""
+                INSERT INTO {messages} (session_id, sender, message, is_feedback)
+                VALUES (%s, %s, %s, %s)
+                RETURNING message_id;
+            """).format(messages=messages),
+            "insert_messages": sql.SQL("""
+                INSERT INTO {messages} (session_id, sender, message, is_feedback)
+                VALUES %s
+                RETURNING session_id, message_id;
+            """).format(messages=messages),
+            "insert_turn": touch_session + sql.SQL("""
+                INSERT INTO {messages} (session_id, sender, message, is_feedback)
+                VALUES (%s, 'user', %s, %s), (%s, 'bot', %s, %s)
+                RETURNING message_id;
+            """).format(messages=messages),
+            "select_last_message_id": sql.SQL("""
+                SELECT max(message_id) AS last_message_id FROM {messages} WHERE session_id = %s;
+            """).format(messages=messages),
+            # newest first so LIMIT bounds the read; walks the (session_id, message_id) index backwards
+            "select_recent_messages": sql.SQL("""
+                SELECT sender, message
+                FROM {messages}
+                WHERE session_id = %s AND is_feedback IS NOT TRUE
+                ORDER BY message_id DESC
+                LIMIT %s;
+            """).format(messages=messages),
+            # one round trip for existence and history: a session without messages yields one row of NULLs
+            "select_session_history": sql.SQL("""
+                SELECT s.session_id, m.sender, m.message
+                FROM {sessions} s
+                LEFT JOIN {messages} m ON m.session_id = s.session_id
+                WHERE s.session_id = %s
+                ORDER BY m.message_id ASC;
+            """).format(sessions=sessions, messages=messages),
+        }
+
+    def _get_connection(self):
+        start = time.perf_counter()
+        self._slots.acquire()
+        waited = time.perf_counter() - start
+        with self._pool_lock:
+            stats = self._stats
+            stats["checkouts"] += 1
+            stats["in_use"] += 1
+            if waited > 0.001:
+                stats["waits"] += 1
+            stats["wait_seconds"] += waited
+            stats["max_wait_seconds"] = max(stats["max_wait_seconds"], waited)
+
+        retries = 3
+        try:
+            for attempt in range(retries):
+                try:
+                    conn = self._pool.getconn()
+                    if conn.closed:
+                        # the server (or the pooler in front of it) dropped the connection while idle
+                        self._pool.putconn(conn, close=True)
+                        raise psycopg2.OperationalError("connection closed")
+                    conn.autocommit = False
+                    return conn
+                except psycopg2.OperationalError as e:
+                    if attempt < retries - 1:
+                        time.sleep(1)
+                        continue
+                    raise e
+        except BaseException:
+            self._release_slot()
+            raise
+
+    def _release_slot(self):
+        with self._pool_lock:
+            self._stats["in_use"] -= 1
+        self._slots.release()
+
+    def _release_connection(self, conn):
+        try:
+            # the pool rolls back an open transaction and discards broken connections
+            self._pool.putconn(conn)
+        finally:
+            self._release_slot()
+
+    def pool_stats(self) -> dict:
+        with self._pool_lock:
+            stats = dict(self._stats)
+        stats["backend"] = "postgres"
+        stats["max_connections"] = self._maxconn
+        stats["available"] = self._maxconn - stats["in_use"]
+        stats["avg_wait_ms"] = stats["wait_seconds"] / stats["checkouts"] * 1000 if stats["checkouts"] else 0.0
+        return stats
+
+    def create_tables(self):
+        conn = self._get_connection()
+        try:
+            with conn.cursor() as cursor:
+                # one worker at a time creates and migrates the tables; the others then find them in place
+                cursor.execute(self._sql["ddl_lock"], (self.DDL_LOCK_KEY,))
+
+                # Ensure schema exists
+                cursor.execute(self._sql["create_schema"])
+
+                # Create sessions table
+                cursor.execute(self._sql["create_sessions"])
+
+                # Create messages table, migrating an unpartitioned one from before lifecycle management
+                cursor.execute(self._sql["messages_kind"], (self.schema,))
+                row = cursor.fetchone()
+                legacy = row is not None and row["relkind"] == "r"
+                if legacy:
+                    cursor.execute(self._sql["rename_legacy_messages"])
+                cursor.execute(self._sql["create_messages"])
+                self._ensure_partitions(cursor)
+                if legacy:
+                    cursor.execute(self._sql["copy_legacy_messages"], (self.schema,))
+
+                cursor.execute(self._sql["create_archive_tables"])
+                conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            self._release_connection(conn)
+
+    # --- lifecycle ---
+    @staticmethod
+    def _month_start(months_from_now: int = 0) -> datetime.date:
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        month_index = today.year * 12 + today.month - 1 + months_from_now
+        return datetime.date(month_index // 12, month_index % 12 + 1, 1)
+
+    def _partition_months(self, cursor) -> dict:
+        """Existing monthly partitions: name -> first day of the month it holds."""
+        cursor.execute(self._sql["list_partitions"], (self.schema,))
+        months = {}
+        for row in cursor.fetchall():
+            match = self.PARTITION_PATTERN.match(row["relname"])
+            if match:
+                months[row["relname"]] = datetime.date(int(match.group(1)), int(match.group(2)), 1)
+        return months
+
+    def _ensure_partitions(self, cursor) -> int:
+        """Create the partitions of the current and the next partition_months_ahead months."""
+        existing = set(self._partition_months(cursor))
+        created = 0
+        for offset in range(self.partition_months_ahead + 1):
+            start, end = self._month_start(offset), self._month_start(offset + 1)
+            name = f"messages_p{start.year}{start.month:02d}"
+            if name in existing:
+                continue
+
+            create = sql.SQL("CREATE TABLE {partition} PARTITION OF {messages} FOR VALUES FROM (%s) TO (%s);").format(
+                partition=sql.Identifier(self.schema, name), messages=sql.Identifier(self.schema, "messages"))
+            cursor.execute(self._sql["default_has_rows"], (start, end))
+            if cursor.fetchone()["has_rows"]:
+                # rows for this month already landed in the DEFAULT partition (the job did not run in time);
+                # a partition cannot be created over them, so move them across while DEFAULT is detached
+                cursor.execute(self._sql["detach_default"])
+                cursor.execute(create, (start, end))
+                cursor.execute(self._sql["move_default_rows"], (start, end))
+                cursor.execute(self._sql["attach_default"])
+            else:
+                cursor.execute(create, (start, end))
+            created += 1
+        return created
+
+    def _drop_old_partitions(self, cursor) -> list[str]:
+        """Drop past monthly partitions that are empty or older than message_retention_months."""
+        current_month = self._month_start()
+        retention_start = self._month_start(-self.message_retention_months) if self.message_retention_months else None
+        dropped = []
+        for name, month in sorted(self._partition_months(cursor).items(), key=lambda item: item[1]):
+            if month >= current_month:
+                continue
+            partition = sql.Identifier(self.schema, name)
+            expired = retention_start is not None and month < retention_start
+            if not expired:
+                cursor.execute(sql.SQL("SELECT EXISTS (SELECT 1 FROM {}) AS has_rows;").format(partition))
+                if cursor.fetchone()["has_rows"]:
+                    continue
+            cursor.execute(sql.SQL("DROP TABLE {};").format(partition))
+            dropped.append(name)
+        return dropped
+
+    def run_lifecycle(self, batch_size: int = 1000) -> dict:
+        """One pass of partition upkeep, session archival and purging. Returns a summary."""
+        summary = {"partitions_created": 0, "sessions_archived": 0, "messages_archived": 0, "partitions_dropped": []}
+        conn = self._get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(self._sql["ddl_lock"], (self.DDL_LOCK_KEY,))
+                summary["partitions_created"] = self._ensure_partitions(cursor)
+                conn.commit()
+
+                if self.session_ttl_days:
+                    # archive in batches, one transaction each, so locks stay short
+                    while True:
+                        cursor.execute(self._sql["archive_sessions"], (self.session_ttl_days, batch_size))
+                        row = cursor.fetchone()
+                        conn.commit()
+                        summary["sessions_archived"] += row["sessions"]
+                        summary["messages_archived"] += row["messages"]
+                        if row["sessions"] < batch_size:
+                            break
+
+                if self.archive_retention_days:
+                    cursor.execute(self._sql["purge_archive"], (self.archive_retention_days, self.archive_retention_days))
+
+                cursor.execute(self._sql["ddl_lock"], (self.DDL_LOCK_KEY,))
+                summary["partitions_dropped"] = self._drop_old_partitions(cursor)
+                conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            self._release_connection(conn)
+        return summary
+
+    def create_session(self, session_id):
+        conn = self._get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(self._sql["insert_session"], (session_id,))
+                conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            self._release_connection(conn)
+
+    def store_message(self, session_id, sender, message, is_feedback=False):
+        conn = self._get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(self._sql["insert_message"], (session_id, session_id, sender, message, is_feedback))
+                message_id = cursor.fetchone()["message_id"]
+                conn.commit()
+                return message_id
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            self._release_connection(conn)
+
+    def store_turn(self, session_id, user_message, bot_response, is_feedback=False):
+        """Store a user message and the bot's response as one multi-row insert in one transaction."""
+        conn = self._get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(self._sql["insert_turn"], (session_id,
+                                                          session_id, user_message, is_feedback,
+                                                          session_id, bot_response, is_feedback))
+                message_id = max(row["message_id"] for row in cursor.fetchall())
+                conn.commit()
+                return message_id
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            self._release_connection(conn)
+
+    def store_turns(self, turns):
+        """Store many (session_id, user_message, bot_response, is_feedback) turns with one multi-row insert."""
+        rows = []
+        for session_id, user_message, bot_response, is_feedback in turns:
+            rows.append((session_id, "user", user_message, is_feedback))
+            rows.append((session_id, "bot", bot_response, is_feedback))
+        # one row per session: ON CONFLICT DO UPDATE cannot touch the same row twice in a statement
+        session_ids = [(session_id,) for session_id in dict.fromkeys(turn[0] for turn in turns)]
+
+        conn = self._get_connection()
+        try:
+            with conn.cursor() as cursor:
+                execute_values(cursor, self._sql["touch_sessions"], session_ids, page_size=len(session_ids))
+                inserted = execute_values(cursor, self._sql["insert_messages"], rows, page_size=len(rows), fetch=True)
+                conn.commit()
+                return self.last_message_ids(inserted)
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            self._release_connection(conn)
+
+    def fetch_session(self, session_id):
+        conn = self._get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(self._sql["select_session_history"], (session_id,))
+                history = []
+                for msg in cursor.fetchall():
+                    if msg["sender"] is None:
+                        continue
+                    history.append(self.history_entry(msg["sender"], msg["message"]))
+                return {"session_id": session_id, "history": history}
+        finally:
+            self._release_connection(conn)
+
+    def fetch_last_message_id(self, session_id):
+        conn = self._get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(self._sql["select_last_message_id"], (session_id,))
+                return cursor.fetchone()["last_message_id"]
+        finally:
+            self._release_connection(conn)
+
+    def fetch_recent_turns(self, session_id, max_turns):
+        """
+        The last max_turns non-feedback turns of a session, oldest first, as
+        {"user_message", "bot_response"} pairs. Only the newest 2 * max_turns rows are read.
+        """
+        if max_turns <= 0:
+            return []
+
+        conn = self._get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(self._sql["select_recent_messages"], (session_id, 2 * max_turns))
+                rows = cursor.fetchall()
+        finally:
+            self._release_connection(conn)
+
+        return self.pair_turns(rows, max_turns)
@@ -0,0 +1,119 @@
+# utils/query_analysis.py
+
+import dataclasses
+import functools
+import re
+
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+from utils.keyword_matcher import KeywordMatcher
+
+@dataclasses.dataclass(frozen=True)
+class QueryAnalysis:
+    """
+    Everything the chat pipeline derives from one user message, computed once per request.
+    Stages read the fields they need instead of lowercasing, tokenizing and keyword-matching the message
+    again. Later facts are added with dataclasses.replace (see QueryAnalyzer.with_history/with_embedding),
+    so an analysis handed to one stage never changes under another.
+    The image search facts (corrected_text, image_keywords) involve fuzzy matching and are only needed in
+    app mode, so they are computed on first access and cached on the instance.
+    """
+
+    text: str
+    words: tuple                                # whitespace-separated tokens, as typed (gibberish detection)
+    tokens: tuple                               # lowercased \w+ tokens
+    keyword_matches: Mapping                    # intent label -> frozenset of keywords in text
+    keyword_normalizer: object = dataclasses.field(repr=False, compare=False)   # image search KeywordNormalizer
+
+    # set by with_history: the previous message's ontology/focus keywords carried over
+    enriched_text: Optional[str] = None
+    tags: tuple = ()
+    enriched_matches: Optional[Mapping] = None
+
+    # set by with_embedding
+    embedding: Optional[tuple] = None
+
+    @property
+    def search_text(self) -> str:
+        return self.enriched_text if self.enriched_text is not None else self.text
+
+    @functools.cached_property
+    def corrected_text(self) -> str:
+        """text with the image search manual corrections applied"""
+        return self.keyword_normalizer.correct_query(self.text)
+
+    @functools.cached_property
+    def image_keywords(self) -> tuple:
+        """canonical image keywords of corrected_text, in order"""
+        return tuple(self.keyword_normalizer.extract_keywords(self.corrected_text))
+
+class QueryAnalyzer:
+    """
+    Builds QueryAnalysis objects from the compiled intent keyword matcher (ChatbotPromptBuilder) and the
+    image keyword normalizer, so each message is tokenized, scanned and fuzzy-matched exactly once.
+    """
+
+    TOKEN_PATTERN = re.compile(r"\w+")
+
+    def __init__(self, prompt_builder, keyword_normalizer):
+        self.prompt_builder = prompt_builder
+        self.keyword_normalizer = keyword_normalizer
+
+    @staticmethod
+    def _freeze(matches: dict) -> Mapping:
+        return MappingProxyType({label: frozenset(keywords) for label, keywords in matches.items()})
+
+    def analyze(self, text: str) -> QueryAnalysis:
+        tokens = tuple(self.TOKEN_PATTERN.findall(text.lower()))
+        return QueryAnalysis(
+            text=text,
+            words=tuple(text.strip().split()),
+            tokens=tokens,
+            keyword_matches=self._freeze(self.prompt_builder.keyword_matcher.scan_tokens(tokens)),
+            keyword_normalizer=self.keyword_normalizer,
+        )
+
+    def with_history(self, analysis: QueryAnalysis, last_user_message: Optional[str]) -> QueryAnalysis:
+        """
+        Carry the ontology/focus keywords of the previous user message over to this one: they become the
+        tags when the message has none of its own, and any the message lacks are appended to the query.
+        """
+        ontology_tag, focus_tag = self.prompt_builder.TAG_ONTOLOGY, self.prompt_builder.TAG_FOCUS
+        current_ontology = analysis.keyword_matches[ontology_tag]
+        current_focus = analysis.keyword_matches[focus_tag]
+
+        previous_matches = self.prompt_builder.scan_keywords(last_user_message) if last_user_message else {}
+        previous_ontology = previous_matches.get(ontology_tag, set())
+        previous_focus = previous_matches.get(focus_tag, set())
+
+        if current_ontology or current_focus:
+            tags = sorted(current_ontology) + sorted(current_focus)
+        else:
+            tags = sorted(previous_ontology) + sorted(previous_focus)
+
+        missing_ontology = previous_ontology - current_ontology
+        missing_focus = previous_focus - current_focus
+
+        enriched_parts = [analysis.text]
+        if missing_ontology:
+            enriched_parts.append(" ".join(missing_ontology))
+        if missing_focus:
+            enriched_parts.append(" ".join(missing_focus))
+
+        # only the appended keywords are new to the enriched query; scan just those
+        enriched_matches = analysis.keyword_matches
+        if len(enriched_parts) > 1:
+            appended_matches = self.prompt_builder.scan_keywords(" ".join(enriched_parts[1:]))
+            enriched_matches = self._freeze(KeywordMatcher.merge(analysis.keyword_matches, appended_matches))
+
+        return dataclasses.replace(analysis, enriched_text=" ".join(enriched_parts), tags=tuple(tags),
+                                   enriched_matches=enriched_matches)
+
+    def with_embedding(self, analysis: QueryAnalysis, embedding) -> QueryAnalysis:
+        return dataclasses.replace(analysis, embedding=tuple(embedding))
+
+    def infer_mode(self, analysis: QueryAnalysis) -> str:
+        """Keyword mode of the enriched query (of the message itself before with_history)."""
+        matches = analysis.enriched_matches if analysis.enriched_matches is not None else analysis.keyword_matches
+        return self.prompt_builder.infer_mode(matches)
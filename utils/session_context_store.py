@@ -0,0 +1,103 @@
+# utils/session_context_store.py
+
+import threading
+import time
+
+from collections import OrderedDict
+
+class SessionContextStore:
+    """
+    Thread-safe, bounded store of small per-session context dicts.
+    Entries expire after ttl_seconds of inactivity and the least recently used session is evicted once
+    max_sessions is reached. On a miss, the optional loader(session_id) is called to rebuild the context
+    (e.g. from stored chat history) so an evicted or restarted session picks up where it left off.
+    """
+
+    def __init__(self, max_sessions: int = 1000, ttl_seconds: float = 3600, loader=None):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.loader = loader
+
+        self._entries = OrderedDict()   # session_id -> (expires_at, context)
+        self._lock = threading.Lock()
+
+    def set_loader(self, loader):
+        self.loader = loader
+
+    def _get_live(self, session_id: str, now: float):
+        # caller holds the lock; the live context of the session, or None (expired entries are dropped)
+        entry = self._entries.get(session_id)
+        if entry:
+            expires_at, context = entry
+            if expires_at > now:
+                self._entries.move_to_end(session_id)
+                return context
+            del self._entries[session_id]
+        return None
+
+    def _load(self, session_id: str) -> dict:
+        # outside the lock; the loader may hit the database
+        return dict(self.loader(session_id) or {}) if self.loader else {}
+
+    def get(self, session_id: str) -> dict:
+        """Return a copy of the session's context, rebuilding it through the loader on a miss."""
+        with self._lock:
+            context = self._get_live(session_id, time.monotonic())
+        if context is not None:
+            return dict(context)
+
+        context = self._load(session_id)
+        with self._lock:
+            # empty contexts are cached too, so a session without history is not reloaded every turn;
+            # an entry stored while the loader ran is newer and wins
+            live = self._get_live(session_id, time.monotonic())
+            if live is not None:
+                return dict(live)
+            if self.loader:
+                self._store(session_id, context)
+        return dict(context)
+
+    def _store(self, session_id: str, context: dict):
+        # caller holds the lock
+        self._entries[session_id] = (time.monotonic() + self.ttl_seconds, context)
+        self._entries.move_to_end(session_id)
+        self._evict()
+
+    def set(self, session_id: str, context: dict):
+        with self._lock:
+            self._store(session_id, dict(context))
+
+    def update(self, session_id: str, values: dict):
+        """
+        Merge values into the session's context atomically. The loader only runs when the session has no
+        live entry to merge into.
+        """
+        if not values:
+            return
+        with self._lock:
+            context = self._get_live(session_id, time.monotonic())
+            if context is not None:
+                self._store(session_id, {**context, **values})
+                return
+
+        loaded = self._load(session_id)
+        with self._lock:
+            context = self._get_live(session_id, time.monotonic())
+            self._store(session_id, {**(loaded if context is None else context), **values})
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _evict(self):
+        # caller holds the lock
+        now = time.monotonic()
+        while self._entries:
+            session_id, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at > now and len(self._entries) <= self.max_sessions:
+                break
+            del self._entries[session_id]
@@ -0,0 +1,91 @@
+# utils/session_store.py
+
+from abc import ABC, abstractmethod
+
+class SessionStore(ABC):
+    """
+    Interface of the chat session backends, selected by [db] backend (see create_session_store).
+    A backend must implement every abstract method; an incomplete one fails when it is instantiated.
+    A session is created by its first stored message. fetch_session returns one history entry per stored
+    message ({"user_message", "bot_response"} with the other side empty); fetch_recent_turns returns the
+    last non-feedback user/bot pairs, oldest first.
+    """
+
+    def _init_lifecycle(self, config, session_ttl_days=None, archive_retention_days=None):
+        self.session_ttl_days = (config.getint("db", "session_ttl_days", fallback=30)
+                                 if session_ttl_days is None else session_ttl_days)
+        self.archive_retention_days = (config.getint("db", "archive_retention_days", fallback=180)
+                                       if archive_retention_days is None else archive_retention_days)
+
+    @abstractmethod
+    def create_tables(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def create_session(self, session_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def store_message(self, session_id, sender, message, is_feedback=False) -> int:
+        """Store one message; returns its message_id."""
+        raise NotImplementedError
+
+    def store_turn(self, session_id, user_message, bot_response, is_feedback=False) -> int:
+        """Store a user message and the bot's response in one transaction; returns the last message_id."""
+        return self.store_turns([(session_id, user_message, bot_response, is_feedback)])[session_id]
+
+    @abstractmethod
+    def store_turns(self, turns) -> dict:
+        """
+        Store many (session_id, user_message, bot_response, is_feedback) turns in one transaction.
+        Returns the last message_id stored for each session.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def fetch_session(self, session_id) -> dict:
+        raise NotImplementedError
+
+    @abstractmethod
+    def fetch_recent_turns(self, session_id, max_turns) -> list[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def fetch_last_message_id(self, session_id):
+        """The newest message_id of a session (None if it has none); a cheap change check for caches."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def run_lifecycle(self) -> dict:
+        """Archive or drop sessions idle for session_ttl_days; returns a summary."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def pool_stats(self) -> dict:
+        raise NotImplementedError
+
+    @staticmethod
+    def history_entry(sender, message) -> dict:
+        return {
+            "user_message": message if sender == "user" else "",
+            "bot_response": message if sender == "bot" else ""
+        }
+
+    @staticmethod
+    def last_message_ids(rows) -> dict:
+        """{session_id: highest message_id} from inserted {"session_id", "message_id"} rows."""
+        last_ids = {}
+        for row in rows:
+            last_ids[row["session_id"]] = max(row["message_id"], last_ids.get(row["session_id"], 0))
+        return last_ids
+
+    @staticmethod
+    def pair_turns(rows, max_turns) -> list[dict]:
+        """Pair {"sender", "message"} rows given newest first into user/bot turns, oldest first."""
+        turns = []
+        for msg in reversed(rows):
+            if msg["sender"] == "user" or not turns or turns[-1]["bot_response"]:
+                turns.append({"user_message": "", "bot_response": ""})
+            key = "user_message" if msg["sender"] == "user" else "bot_response"
+            turns[-1][key] = msg["message"]
+        return turns[-max_turns:]
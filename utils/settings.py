@@ -0,0 +1,203 @@
+# utils/settings.py
+
+import asyncio
+import configparser
+import dataclasses
+import json
+import os
+import threading
+
+from pathlib import Path
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+from utils.config import Config
+from utils.logging import get_logger
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+def _mtime_ns(path) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+@dataclasses.dataclass(frozen=True)
+class AppSettings:
+    name: str
+    debug: bool
+
+@dataclasses.dataclass(frozen=True)
+class AISettings:
+    model: str
+
+@dataclasses.dataclass(frozen=True)
+class ChatbotSettings:
+    name: str
+    max_history_pairs: int
+    intent_classifier: bool
+    intent_min_score: float
+    intent_margin: float
+
+@dataclasses.dataclass(frozen=True)
+class DocumentStoreSettings:
+    doc_max_chars: Optional[int]    # None = no limit
+
+@dataclasses.dataclass(frozen=True)
+class VectorDBSettings:
+    doc_namespace: str
+    stories_namespace: str
+    image_namespace: str
+    top_k: Mapping          # file type ("doc", "stories") -> int, from the *_top_k options
+    thresholds: Mapping     # file type -> float, from the *_threshold options
+
+@dataclasses.dataclass(frozen=True)
+class Settings:
+    """
+    Typed snapshot of the settings read on the request path, parsed once from config.ini and the chatbot
+    config JSON. A snapshot is never modified: SettingsStore.reload() parses a new one and swaps it in, so a
+    request that took a snapshot reads one consistent version of every value.
+    Only the values below hot-reload (debug, the AI model, history length, intent classifier switches,
+    doc_max_chars, vector db top_k/thresholds/namespaces and the chatbot config JSON), plus the prompt
+    profiles and intent keywords, which chatbot.py rebuilds from a reload listener. Everything else
+    (document/image store, embedding models, db, gibberish, cache settings) is read once from Config() at
+    startup and needs a restart.
+    """
+
+    app: AppSettings
+    ai: AISettings
+    chatbot: ChatbotSettings
+    documentstore: DocumentStoreSettings
+    vectordb: VectorDBSettings
+    chatbot_config: Mapping     # the chatbot config JSON (treat as read-only)
+    sources: tuple              # ((path, mtime_ns), ...) the snapshot was parsed from
+    version: int = 0
+
+    @classmethod
+    def parse(cls, config_path: Path, version: int = 0, watched_paths: tuple = ()) -> "Settings":
+        """watched_paths: further files whose changes should trigger a reload (see SettingsStore.watch)."""
+        parser = configparser.ConfigParser()
+        if not parser.read(config_path, encoding="utf-8"):
+            raise FileNotFoundError(f"{cls.__name__} {config_path} not found.")
+
+        chatbot_config_path = REPO_ROOT / parser.get("hr-demo", "chatbot_config_file", fallback="chatbot_config.json")
+        try:
+            with open(chatbot_config_path, "r", encoding="utf-8") as f:
+                chatbot_config = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{cls.__name__} Invalid JSON format in {chatbot_config_path}: {e}")
+
+        vectordb = parser["vectordb"]
+        return cls(
+            app=AppSettings(
+                name=parser.get("hr-demo", "name"),
+                debug=parser.getboolean("hr-demo", "debug", fallback=False),
+            ),
+            ai=AISettings(model=parser.get("ai", "model")),
+            chatbot=ChatbotSettings(
+                name=parser.get("chatbot", "name"),
+                max_history_pairs=parser.getint("chatbot", "max_history_pairs", fallback=2),
+                intent_classifier=parser.getboolean("chatbot", "intent_classifier", fallback=True),
+                intent_min_score=parser.getfloat("chatbot", "intent_min_score", fallback=0.0),
+                intent_margin=parser.getfloat("chatbot", "intent_margin", fallback=0.0),
+            ),
+            documentstore=DocumentStoreSettings(
+                doc_max_chars=parser.getint("documentstore", "doc_max_chars", fallback=0) or None,
+            ),
+            vectordb=VectorDBSettings(
+                doc_namespace=vectordb.get("doc_namespace"),
+                stories_namespace=vectordb.get("stories_namespace"),
+                image_namespace=vectordb.get("image_namespace"),
+                top_k=MappingProxyType({key[:-len("_top_k")]: vectordb.getint(key)
+                                        for key in vectordb if key.endswith("_top_k")}),
+                thresholds=MappingProxyType({key[:-len("_threshold")]: vectordb.getfloat(key)
+                                             for key in vectordb if key.endswith("_threshold")}),
+            ),
+            chatbot_config=MappingProxyType(chatbot_config),
+            sources=tuple((str(path), _mtime_ns(path)) for path in (config_path, chatbot_config_path, *watched_paths)),
+            version=version,
+        )
+
+class SettingsStore:
+    """
+    Holds the current Settings snapshot. Readers take `current` (one attribute read, no parsing);
+    reload() parses the files into a new snapshot and swaps it in atomically, then notifies listeners so
+    components that keep derived state can refresh it. run_watch_loop() reloads whenever a source file's
+    mtime changes, including files registered with watch() (e.g. the prompt profiles, which the settings do
+    not parse but a listener rebuilds). A reload that fails keeps the previous snapshot.
+    """
+
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._init_store(REPO_ROOT / "config.ini")
+        return cls._instance
+
+    def _init_store(self, config_path: Path):
+        self.config_path = Path(config_path)
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._watched_paths = ()
+        self.app_logger = get_logger(Config().get("log", "app"))
+        self.current = Settings.parse(self.config_path, version=1)
+
+    def subscribe(self, listener):
+        """listener(settings) runs after every successful reload."""
+        self._listeners.append(listener)
+
+    def watch(self, *paths):
+        """Also reload when one of these files changes; takes effect from the current snapshot on."""
+        with self._lock:
+            new_paths = tuple(str(path) for path in paths if str(path) not in self._watched_paths)
+            if not new_paths:
+                return
+            self._watched_paths += new_paths
+            # same values, more sources: not a new version
+            self.current = dataclasses.replace(
+                self.current, sources=self.current.sources + tuple((path, _mtime_ns(path)) for path in new_paths))
+
+    def reload(self, raise_listener_errors: bool = False) -> Settings:
+        """
+        Parse and swap in a new snapshot, then run every listener. A listener that fails is logged; with
+        raise_listener_errors its exception is re-raised once all listeners ran (the new snapshot stays).
+        """
+        with self._lock:
+            settings = Settings.parse(self.config_path, version=self.current.version + 1,
+                                      watched_paths=self._watched_paths)
+            self.current = settings
+        listener_error = None
+        for listener in self._listeners:
+            try:
+                listener(settings)
+            except Exception as e:
+                listener_error = listener_error or e
+                self.app_logger.error(f"{self.__class__.__name__} settings listener {listener} failed: {e}")
+        self.app_logger.info(f"{self.__class__.__name__} settings reloaded (version {settings.version})")
+        if raise_listener_errors and listener_error:
+            raise listener_error
+        return settings
+
+    def _stat_sources(self) -> tuple:
+        """((path, mtime_ns or None if missing), ...) of the current snapshot's source files, as on disk now."""
+        return tuple((path, _mtime_ns(path)) for path, _ in self.current.sources)
+
+    def is_stale(self) -> bool:
+        """True when a source file changed (or disappeared) since the current snapshot was parsed."""
+        return self._stat_sources() != self.current.sources
+
+    async def run_watch_loop(self, interval: float):
+        failed_sources = None   # file state whose reload failed; retried only once the files change again
+        while True:
+            await asyncio.sleep(interval)
+            sources = self._stat_sources()
+            if sources == self.current.sources or sources == failed_sources:
+                continue
+            try:
+                await asyncio.to_thread(self.reload)
+                failed_sources = None
+            except Exception as e:
+                failed_sources = sources
+                self.app_logger.error(f"{self.__class__.__name__} settings reload failed, keeping version "
+                                      f"{self.current.version}: {e}")
@@ -0,0 +1,207 @@
+# utils/sqlite_session_store.py
+
+import sqlite3
+import threading
+import time
+
+from pathlib import Path
+
+from utils.config import Config
+from utils.session_store import SessionStore
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Session store in a local SQLite file, for single-node deployments, local development and load tests.
+    The database runs in WAL mode, so readers never block the single writer, with synchronous=NORMAL
+    (durable across application crashes; the last commits can be lost on power failure). Each thread
+    gets its own connection. Timestamps are Unix epoch seconds.
+    """
+
+    def __init__(self, path=None, session_ttl_days=None, archive_retention_days=None):
+        config = Config()
+        self.path = Path(path or config.get("db", "sqlite_path", fallback="/tmp/chat_sessions.db"))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._init_lifecycle(config, session_ttl_days, archive_retention_days)
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute("PRAGMA synchronous=NORMAL;")
+            conn.execute("PRAGMA foreign_keys=ON;")
+            self._local.conn = conn
+            with self._lock:
+                self._connections += 1
+        return conn
+
+    def create_tables(self):
+        conn = self._connection()
+        with conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    created_at REAL NOT NULL,
+                    last_active_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS sessions_last_active_at_idx ON sessions (last_active_at);
+
+                CREATE TABLE IF NOT EXISTS messages (
+                    message_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT REFERENCES sessions(session_id),
+                    sender TEXT,
+                    message TEXT,
+                    is_feedback INTEGER DEFAULT 0,
+                    created_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS messages_session_id_message_id_idx ON messages (session_id, message_id);
+
+                CREATE TABLE IF NOT EXISTS sessions_archive (
+                    session_id TEXT PRIMARY KEY,
+                    created_at REAL,
+                    last_active_at REAL,
+                    archived_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS messages_archive (
+                    message_id INTEGER,
+                    session_id TEXT,
+                    sender TEXT,
+                    message TEXT,
+                    is_feedback INTEGER,
+                    created_at REAL,
+                    archived_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS messages_archive_session_id_message_id_idx
+                ON messages_archive (session_id, message_id);
+            """)
+
+    @staticmethod
+    def _touch_sessions(conn, session_ids, now):
+        conn.executemany("""
+            INSERT INTO sessions (session_id, created_at, last_active_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT (session_id) DO UPDATE SET last_active_at = excluded.last_active_at;
+        """, [(session_id, now, now) for session_id in session_ids])
+
+    def create_session(self, session_id):
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute("""
+                INSERT INTO sessions (session_id, created_at, last_active_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT (session_id) DO NOTHING;
+            """, (session_id, now, now))
+
+    def store_message(self, session_id, sender, message, is_feedback=False):
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            self._touch_sessions(conn, [session_id], now)
+            cursor = conn.execute("""
+                INSERT INTO messages (session_id, sender, message, is_feedback, created_at)
+                VALUES (?, ?, ?, ?, ?);
+            """, (session_id, sender, message, is_feedback, now))
+        return cursor.lastrowid
+
+    def store_turns(self, turns):
+        now = time.time()
+        rows = []
+        for session_id, user_message, bot_response, is_feedback in turns:
+            rows.append((session_id, "user", user_message, is_feedback, now))
+            rows.append((session_id, "bot", bot_response, is_feedback, now))
+
+        session_ids = list(dict.fromkeys(turn[0] for turn in turns))
+
+        conn = self._connection()
+        with conn:
+            self._touch_sessions(conn, session_ids, now)
+            conn.executemany("""
+                INSERT INTO messages (session_id, sender, message, is_feedback, created_at)
+                VALUES (?, ?, ?, ?, ?);
+            """, rows)
+            placeholders = ", ".join("?" * len(session_ids))
+            inserted = conn.execute(f"""
+                SELECT session_id, max(message_id) AS message_id FROM messages
+                WHERE session_id IN ({placeholders}) GROUP BY session_id;
+            """, session_ids).fetchall()
+        return self.last_message_ids(inserted)
+
+    def fetch_session(self, session_id):
+        rows = self._connection().execute("""
+            SELECT sender, message
+            FROM messages
+            WHERE session_id = ?
+            ORDER BY message_id ASC;
+        """, (session_id,)).fetchall()
+        return {"session_id": session_id, "history": [self.history_entry(row["sender"], row["message"]) for row in rows]}
+
+    def fetch_last_message_id(self, session_id):
+        return self._connection().execute(
+            "SELECT max(message_id) AS last_message_id FROM messages WHERE session_id = ?;", (session_id,)
+        ).fetchone()["last_message_id"]
+
+    def fetch_recent_turns(self, session_id, max_turns):
+        if max_turns <= 0:
+            return []
+
+        rows = self._connection().execute("""
+            SELECT sender, message
+            FROM messages
+            WHERE session_id = ? AND NOT is_feedback
+            ORDER BY message_id DESC
+            LIMIT ?;
+        """, (session_id, 2 * max_turns)).fetchall()
+        return self.pair_turns(rows, max_turns)
+
+    def run_lifecycle(self, batch_size: int = 1000) -> dict:
+        summary = {"sessions_archived": 0, "messages_archived": 0}
+        now = time.time()
+        conn = self._connection()
+
+        while self.session_ttl_days:
+            with conn:
+                session_ids = [row["session_id"] for row in conn.execute("""
+                    SELECT session_id FROM sessions
+                    WHERE last_active_at < ?
+                    ORDER BY last_active_at
+                    LIMIT ?;
+                """, (now - self.session_ttl_days * 86400, batch_size))]
+                if not session_ids:
+                    break
+
+                placeholders = ", ".join("?" * len(session_ids))
+                moved = conn.execute(f"""
+                    INSERT INTO messages_archive (message_id, session_id, sender, message, is_feedback, created_at, archived_at)
+                    SELECT message_id, session_id, sender, message, is_feedback, created_at, ?
+                    FROM messages WHERE session_id IN ({placeholders});
+                """, (now, *session_ids)).rowcount
+                conn.execute(f"DELETE FROM messages WHERE session_id IN ({placeholders});", session_ids)
+                conn.execute(f"""
+                    INSERT INTO sessions_archive (session_id, created_at, last_active_at, archived_at)
+                    SELECT session_id, created_at, last_active_at, ? FROM sessions WHERE session_id IN ({placeholders})
+                    ON CONFLICT (session_id) DO UPDATE
+                    SET last_active_at = excluded.last_active_at, archived_at = excluded.archived_at;
+                """, (now, *session_ids))
+                conn.execute(f"DELETE FROM sessions WHERE session_id IN ({placeholders});", session_ids)
+
+            summary["sessions_archived"] += len(session_ids)
+            summary["messages_archived"] += moved
+            if len(session_ids) < batch_size:
+                break
+
+        if self.archive_retention_days:
+            cutoff = now - self.archive_retention_days * 86400
+            with conn:
+                conn.execute("DELETE FROM messages_archive WHERE archived_at < ?;", (cutoff,))
+                conn.execute("DELETE FROM sessions_archive WHERE archived_at < ?;", (cutoff,))
+        return summary
+
+    def pool_stats(self) -> dict:
+        with self._lock:
+            return {"backend": "sqlite", "path": str(self.path), "connections": self._connections}
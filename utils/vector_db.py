@@ -99,16 +99,19 @@ class VectorDB:
 
         try:
             result = self.image_index.query(**query_params)
-            matches = result.get("matches", [])
-            for match in matches:
-                metadata = match.get("metadata", {})
-                if "id" in match:
-                    metadata["file_name"] = os.path.basename(match["id"])
-            return [match.get("metadata", {}) for match in matches]
         except Exception as e:
             self.app_logger.error(f"{self.__class__.__name__} Pinecone image query failed: {e}")
             return []
 
+        # matches are Pinecone ScoredVector objects, not dicts: read them, never write to them
+        results = []
+        for match in result.get("matches", []):
+            metadata = {**(match.get("metadata") or {}), "score": match.get("score") or 0.0}
+            if match.get("id"):
+                metadata["file_name"] = os.path.basename(match["id"])
+            results.append(metadata)
+        return results
+
     # --- Utilities ---
     def filter_matches_by_score(self, matches: list[dict], threshold: float) -> list[dict]:
         if not matches: